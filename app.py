@@ -2,92 +2,245 @@
 import streamlit as st
 import pandas as pd
 import io
-import requests
-import json
+import hashlib
 import time
 
-# --- Helper Function to create sample Excel files in memory ---
-def create_sample_files():
-    """Creates two sample Excel files (scores and comments) in memory for download."""
-    
-    # Sample Data for Scores
-    scores_data = {
-        'name': ['Ayesha', 'Ali', 'Badreyah'],
-        'gender': ['Female', 'Male', 'Female'],
-        'level': ['Guide', 'Apply', 'Apply'],
-        'Overall Leadership': [2.97, 2.55, 3.66],
-        'Drives Results': [3.0, 1.9, 3.9],
-        'Leads People': [3.2, 2.6, 4.2],
-        'Manages Stakeholders': [2.4, 2.4, 4.2],
-        'Thinks Strategically': [3.4, 2.5, 3.9],
-        'Solves Challenges': [3.9, 1.7, 3.9],
-        'Steers Change': [2.9, 2.8, 4.3]
+from gemini_client import GeminiDispatcher
+from generation import MODEL_NAME, GenerationOptions, build_jobs, draft_reports, generate_reports, prepare_candidates
+from ingestion import SUPPORTED_EXTENSIONS, XLSX_ENGINE, has_errors, read_table, validate_uploads
+from job_queue import QUEUED, JobManager
+from prompt_builder import STATIC_PREFIX, estimate_tokens
+from report_validator import VALID_STATUS, add_validation_status
+from response_cache import ResponseCache
+from rule_engine import compute_report_facts
+from run_journal import RunJournal, make_run_id
+from sample_data import create_sample_files
+from telemetry import MODEL_PRICING, RunTelemetry, write_metrics_sheet
+
+# --- Sample template files, memoized for the process lifetime ---
+@st.cache_data(show_spinner=False)
+def get_sample_files():
+    """Returns the scores and comments template bytes, built once per process."""
+    return create_sample_files()
+
+# --- Upload parsing, cached across reruns by file content hash ---
+@st.cache_data(max_entries=8, show_spinner=False)
+def parse_upload(content_hash, file_name, _file_bytes):
+    """Parses an uploaded file once per distinct content and type. Returns (DataFrame, parse seconds, parsed at)."""
+    started = time.perf_counter()
+    df = read_table(_file_bytes, file_name)
+    return df, time.perf_counter() - started, time.time()
+
+def load_upload(uploaded_file):
+    """Returns the parsed DataFrame for an upload plus load statistics for the debug expander."""
+    started_at = time.time()
+    started = time.perf_counter()
+    file_bytes = uploaded_file.getvalue()
+    content_hash = hashlib.sha256(file_bytes).hexdigest()
+    df, parse_seconds, parsed_at = parse_upload(content_hash, uploaded_file.name, file_bytes)
+    stats = {
+        'file': uploaded_file.name,
+        'reader': XLSX_ENGINE if uploaded_file.name.lower().endswith('.xlsx') else uploaded_file.name.rsplit('.', 1)[-1],
+        'content hash': content_hash[:12],
+        'upload size (KB)': round(len(file_bytes) / 1024, 1),
+        'cached frame size (KB)': round(df.memory_usage(deep=True).sum() / 1024, 1),
+        'rows': len(df),
+        'cache': 'hit' if parsed_at < started_at else 'miss',
+        'original parse (ms)': round(parse_seconds * 1000, 1),
+        'this load (ms)': round((time.perf_counter() - started) * 1000, 1),
     }
-    scores_df = pd.DataFrame(scores_data)
-
-    # Sample Data for Assessor Comments
-    comments_data = [
-        {'name': 'Ayesha', 'comment_type': 'Strength', 'Steers Change': 'The candidate demonstrates confidence in navigating periods of change and serves as a role model, creating a positive attitude during change initiatives.', 'Manages Stakeholders': 'The candidate demonstrates effective strategies for identifying relationships that can support the achievement of their individual objectives.', 'Drives Results': 'The candidate demonstrates a committed approach to maintaining consistent performance for themselves and their team across projects.', 'Thinks Strategically': 'The candidate demonstrates a solid understanding of both short-term and long-term strategic approaches to projects.', 'Solves Challenges': 'The candidate demonstrates strong ability to identify issues proactively and develop effective, logical solutions.', 'Leads People': 'The candidate demonstrates the ability to support their team through valuable contributions that aid in the development of team members.'},
-        {'name': 'Ayesha', 'comment_type': 'Development Area', 'Steers Change': 'The candidate would benefit from proactively seeking to understand the underlying reasons for change, to better sustain team motivation and engagement throughout the change process.', 'Manages Stakeholders': 'The candidate would benefit from ensuring that the mutual objectives of relevant stakeholders are aligned and supported, to secure buy-in and sustain long-lasting relationships.', 'Drives Results': 'The candidate would benefit from developing strategies to effectively allocate resources to address the varying priorities within the workload.', 'Thinks Strategically': 'The candidate would benefit from proactively anticipating external industry changes and adjusting plans accordingly to stay ahead of emerging trends.', 'Solves Challenges': 'The candidate would benefit from offering reassurance to team members during challenges and promoting resilience within the team.', 'Leads People': 'The candidate would benefit from effectively resolving conflicts within the team to maintain cohesion and a positive working environment.'},
-        {'name': 'Ali', 'comment_type': 'Strength', 'Steers Change': 'The candidate evidenced being able to effectively navigate ambiguous situations by adapting to task changes.', 'Manages Stakeholders': 'The candidate demonstrates a solid ability to build relationships with key stakeholders within their environment.', 'Drives Results': 'The candidate demonstrates some ability to monitor their performance daily, which can support goal achievement', 'Thinks Strategically': 'The candidate demonstrates moderate awareness of risk factors that could delay project work and proactively seeks support to develop contingency plans.', 'Solves Challenges': 'The candidate demonstrates initiative in addressing project challenges and effectively raises issues with relevant stakeholders', 'Leads People': 'The candidate demonstrates reasonable confidence in collaborating effectively with others to achieve team objectives.'},
-        {'name': 'Ali', 'comment_type': 'Development Area', 'Steers Change': 'The candidate would benefit by following up on actions to ensure change efforts are successful.', 'Manages Stakeholders': 'To strengthen this area, the candidate should allocate additional time to understand the interests and priorities of other stakeholders, to help create win-win situations.', 'Drives Results': 'The candidate provided limited evidence of exceeding goals and would benefit from developing strategies to consistently perform at or above higher-than-expected levels.', 'Thinks Strategically': 'The candidate should work on effectively proposing strategic recommendations that support team growth and long-term success.', 'Solves Challenges': 'The candidate should work on maintaining composure when faced with significant setbacks, to prevent becoming overwhelmed and to better manage challenges.', 'Leads People': 'The candidate would benefit from developing skills to manage disagreements within the team more effectively, ensuring that conflicts do not hinder project progress.'}
-    ]
-    comments_df = pd.DataFrame(comments_data)
-
-    # Convert DataFrames to Excel format in memory
-    output_scores = io.BytesIO()
-    with pd.ExcelWriter(output_scores, engine='openpyxl') as writer:
-        scores_df.to_excel(writer, index=False, sheet_name='Scores')
-    processed_scores = output_scores.getvalue()
-
-    output_comments = io.BytesIO()
-    with pd.ExcelWriter(output_comments, engine='openpyxl') as writer:
-        comments_df.to_excel(writer, index=False, sheet_name='Comments')
-    processed_comments = output_comments.getvalue()
-    
-    return processed_scores, processed_comments
-
-# --- Function to call Gemini API with exponential backoff ---
-def call_gemini_api(prompt, api_key):
-    """Calls the Gemini API with exponential backoff and returns the generated text."""
-    if not api_key:
-        return "Error: Gemini API key is missing. Please provide it in the sidebar."
-
-    model_name = "gemini-2.5-pro"
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={api_key}"
-    
-    headers = {'Content-Type': 'application/json'}
-    payload = {"contents": [{"parts": [{"text": prompt}]}]}
-    
-    max_retries = 5
-    base_delay = 1  # seconds
-
-    for i in range(max_retries):
+    return df, stats
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def check_uploads(content_hashes, _scores_df, _comments_df, file_names):
+    """Validates the uploaded files once per distinct pair. Returns every problem row found."""
+    return validate_uploads(_scores_df, _comments_df, *file_names)
+
+# --- Shared Gemini client (one per quota setting, shared by all sessions in this process) ---
+@st.cache_resource(show_spinner=False)
+def get_gemini_client(api_keys, models, requests_per_minute, tokens_per_minute):
+    """Returns the shared API dispatcher so connections and rate limiters are reused across reruns and sessions."""
+    return GeminiDispatcher(api_keys, models, requests_per_minute=requests_per_minute, tokens_per_minute=tokens_per_minute)
+
+# --- Live run metrics panel ---
+def render_run_metrics(placeholder, telemetry):
+    """Renders the headline run metrics into a placeholder (called repeatedly while generating)."""
+    summary = telemetry.summary()
+    with placeholder.container():
+        cols = st.columns(6)
+        cols[0].metric("Completed", f"{summary['candidates completed']} ({summary['from cache']} cached)")
+        cols[1].metric("Throughput", f"{summary['throughput (candidates/min)']}/min")
+        cols[2].metric("Latency p50 / p95", f"{summary['HTTP latency p50 (ms)'] / 1000:.1f}s / {summary['HTTP latency p95 (ms)'] / 1000:.1f}s")
+        cols[3].metric("Retries", summary['total retries'])
+        cols[4].metric("Tokens in / out", f"{summary['prompt tokens']:,} / {summary['output tokens']:,}")
+        cols[5].metric("Est. Cost", f"${summary['estimated cost (USD)']:.2f}")
+
+# --- Background report jobs (one executor per process, so runs survive reruns, reconnects and other sessions) ---
+JOB_POLL_SECONDS = 1.0
+
+@st.cache_resource(show_spinner=False)
+def get_job_manager():
+    """Returns the process-wide executor that runs report generation off the Streamlit script thread."""
+    return JobManager()
+
+def run_report_job(job, scores_df, comments_df, options):
+    """Generates the reports for one cohort on a background worker thread. Returns the results table and Excel bytes.
+
+    Runs outside any script run, so it must not call Streamlit: progress, streamed text and notices are written
+    to the job and rendered by whichever session polls it.
+    """
+    candidate_list = scores_df['name'].unique()
+    prepared_candidates, skipped_candidates = prepare_candidates(scores_df, comments_df)
+    job.total = len(candidate_list)
+    job.done = len(skipped_candidates)
+    if skipped_candidates:
+        job.notify('warning', f"The following candidates were skipped due to missing comment data: {', '.join(map(str, skipped_candidates))}")
+
+    # --- Score-driven report facts for the whole cohort in one pass ---
+    report_facts = compute_report_facts(scores_df)
+
+    if options['draft_only']:
+        # --- Offline drafts from the rule engine (no API calls) ---
+        all_summaries = draft_reports(prepared_candidates, report_facts)
+        generated_reports = []
+        job.done = job.total
+        job.notify('success', f"Drafted {len(all_summaries)} reports offline with the rule engine.")
+    else:
+        # --- Durable run journal, keyed by the uploaded files and prompt settings ---
+        run_journal = RunJournal(options['run_id'])
+        run_journal.reset_unless_resuming(options['resume_run'], options['bypass_cache'])
+        already_completed = run_journal.completed()
+        if already_completed:
+            job.notify('info', f"Resuming run: {len(already_completed)} candidates were already completed and were not regenerated.")
+            job.done += len(already_completed)
+        job.rows.extend({'name': name, 'summary': summary} for name, summary in already_completed.items())
+
+        run_telemetry = RunTelemetry(MODEL_NAME)
+        job.telemetry = run_telemetry
+        pending_jobs, tokens_saved = build_jobs(
+            prepared_candidates, report_facts, options['use_rule_facts'], exclude=already_completed, telemetry=run_telemetry
+        )
+
+        def update_progress(candidate_name, finished_count, summary):
+            job.done = len(skipped_candidates) + len(already_completed) + finished_count
+            job.message = f"Generated report for {candidate_name} ({job.done}/{job.total})"
+            job.rows.append({'name': candidate_name, 'summary': summary})
+
+        def show_partial(candidate_name, text):
+            job.partial = (candidate_name, text)
+
+        # --- Live API Calls (concurrent, polled by the UI as they arrive) ---
+        response_cache = ResponseCache()
+        gemini_client = options['client']
+        job.message = (f"Generating {len(pending_jobs)} reports ({options['batch_size']} per request) "
+                       f"with up to {options['max_workers']} concurrent requests...")
+        resume_hint = "Generate again with 'Resume previous run' ticked and 'Bypass response cache' unticked to finish the rest."
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=120)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            if 'candidates' in result and result['candidates']:
-                content_part = result['candidates'][0].get('content', {}).get('parts', [{}])[0]
-                return content_part.get('text', "Error: Could not extract text from API response.")
-            else:
-                # Log the invalid response for debugging
-                st.write(f"Invalid API response received: {result}")
-                return f"Error: The API response was invalid."
-
-        except requests.exceptions.RequestException as e:
-            if i < max_retries - 1:
-                time.sleep(base_delay * (2 ** i))
-                continue
-            else:
-                return f"Error: An API request failed after multiple retries: {e}"
-        except Exception as e:
-            return f"An unexpected error occurred: {e}"
+            generated_reports = generate_reports(pending_jobs, options['api_key'], GenerationOptions(
+                options['max_workers'], options['batch_size'], options['max_corrections'], cache=response_cache,
+                bypass_cache=options['bypass_cache'], journal=run_journal, client=gemini_client, telemetry=run_telemetry,
+                on_complete=update_progress, on_partial=show_partial if options['stream_responses'] else None,
+                cancel_event=job.cancel_event
+            ))
+        except Exception:
+            job.notify('warning', f"{len(run_journal.completed())} reports were completed and saved before the failure. {resume_hint}")
+            raise
+        finally:
+            job.partial = None
+            run_telemetry.finish()
+            response_cache.evict()
+            response_cache.close()
+
+        # --- Assemble the results from the journal, not from memory ---
+        all_summaries = run_journal.load_results(prepared_candidates.keys())
+
+        if job.cancel_requested:
+            job.notify('warning', f"Cancelled: {len(all_summaries)} of {len(prepared_candidates)} reports were completed and saved. {resume_hint}")
+        else:
+            job.notify('success', "All summaries have been generated successfully!")
+        if gemini_client.throttle_count:
+            job.notify('caption', f"The API throttled requests (HTTP 429) {gemini_client.throttle_count} times so far; requests were slowed down or moved to another key or model automatically.")
+        if options['bypass_cache']:
+            job.notify('caption', f"Response cache bypassed: {len(generated_reports)} reports requested from the API.")
+        else:
+            job.notify('caption', f"Response cache: {response_cache.hits} hits, {response_cache.misses} misses (only misses were sent to the API).")
+        job.notify('caption',
+            f"Prompt size: ~{tokens_saved:,} input tokens saved this run by sending only each candidate's level matrix or precomputed facts; "
+            f"the first ~{estimate_tokens(STATIC_PREFIX):,} tokens of every prompt are a shared prefix eligible for Gemini context caching."
+        )
+
+    # --- Build the results table and Excel download ---
+    results_df = pd.DataFrame(add_validation_status(all_summaries, prepared_candidates), columns=['name', 'summary', 'validation'])
+    # Which model and key produced each report generated in this run (empty for drafts, cached and resumed ones)
+    provenance_df = pd.DataFrame(generated_reports, columns=['name', 'model', 'api_key'])
+    results_df = results_df.merge(provenance_df, on='name', how='left')
+    failing_count = int((results_df['validation'] != VALID_STATUS).sum())
+    if failing_count:
+        job.notify('warning', f"{failing_count} reports still break the Appendix rules or failed; see the 'validation' column.")
+
+    output_results = io.BytesIO()
+    with pd.ExcelWriter(output_results, engine='openpyxl') as writer:
+        results_df.to_excel(writer, index=False, sheet_name='Generated Summaries')
+        if job.telemetry is not None:
+            write_metrics_sheet(writer, job.telemetry)
+    return {'results_df': results_df, 'output': output_results.getvalue()}
+
+def render_job_messages(job):
+    for kind, text in list(job.messages):
+        getattr(st, kind)(text)
+
+def render_active_job(job_manager, job):
+    """Renders a queued or running job's live progress, streamed text and metrics, with a Cancel button."""
+    st.subheader(f"Job `{job.job_id}`: {job.label}")
+    if job.status == QUEUED:
+        st.info(f"Queued behind {job_manager.queue_position(job.job_id)} other job(s); at most {job_manager.max_running_jobs} jobs run at once.")
+    else:
+        progress_text = "Cancelling: waiting for requests already in flight..." if job.cancel_requested else job.message
+        st.progress(job.done / job.total if job.total else 0.0, text=progress_text or None)
+    render_job_messages(job)
+    partial = job.partial
+    if partial is not None:
+        st.markdown(f"**Writing the report for {partial[0]}...**\n\n{partial[1]}")
+    if job.telemetry is not None:
+        render_run_metrics(st.empty(), job.telemetry)
+    if job.rows:
+        st.dataframe(pd.DataFrame(list(job.rows)))
+    st.button("Cancel", key=f"cancel-{job.job_id}", on_click=job_manager.cancel, args=(job.job_id,), disabled=job.cancel_requested)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def active_jobs_panel(job_manager, job_ids):
+    """Polls the session's unfinished jobs; only this fragment reruns, so the rest of the page stays responsive."""
+    jobs = [job_manager.get(job_id) for job_id in job_ids]
+    if any(job is None or job.finished for job in jobs):
+        # A job just finished: rerun the whole page to show its results and stop polling when none are left
+        st.rerun()
+    for job in jobs:
+        render_active_job(job_manager, job)
+
+def render_finished_job(job):
+    """Renders a finished job's notices, results table, download button and run metrics."""
+    st.subheader(f"Job `{job.job_id}`: {job.label} ({job.status})")
+    if job.error is not None:
+        st.error(f"An error occurred while processing the files: {job.error}")
+        st.warning("Please ensure your uploaded files match the format of the downloadable templates.")
+    render_job_messages(job)
+    if job.result is not None:
+        st.dataframe(job.result['results_df'])
+        st.download_button(
+            label="⬇️ Download All Summaries (.xlsx)",
+            data=job.result['output'],
+            file_name="all_candidate_summaries.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            key=f"download-{job.job_id}"
+        )
+    if job.telemetry is not None:
+        with st.expander("Run Metrics"):
+            st.dataframe(pd.DataFrame(list(job.telemetry.summary().items()), columns=['metric', 'value']).astype(str), hide_index=True)
+            st.dataframe(job.telemetry.records_frame(), hide_index=True)
 
 # --- Main Application Logic ---
 st.set_page_config(layout="wide", page_title="Leadership Report Generator")
+st.session_state.setdefault('job_ids', [])
 
 st.title("🤖 Leadership Potential Report Generator")
 st.markdown("""
@@ -101,13 +254,18 @@ with st.sidebar:
     
     # API Key Input
     st.subheader("1. Enter API Key")
-    gemini_api_key = st.text_input("Gemini API Key", type="password", help="Get your key from Google AI Studio.")
+    gemini_api_key = st.text_input(
+        "Gemini API Key(s)",
+        type="password",
+        help="Get your key from Google AI Studio. Separate several keys (e.g. from different projects) with commas to spread requests over their quotas."
+    )
+    gemini_api_keys = tuple(key.strip() for key in gemini_api_key.split(',') if key.strip())
 
     st.divider()
 
     # Download Sample Files
     st.subheader("2. Download Templates")
-    sample_scores_data, sample_comments_data = create_sample_files()
+    sample_scores_data, sample_comments_data = get_sample_files()
     st.download_button(
         label="Download Scores Template (.xlsx)",
         data=sample_scores_data,
@@ -125,301 +283,137 @@ with st.sidebar:
 
     # File Uploaders
     st.subheader("3. Upload Your Files")
-    uploaded_scores_file = st.file_uploader("Upload Candidate Scores Excel File", type=["xlsx"])
-    uploaded_comments_file = st.file_uploader("Upload Assessor Comments Excel File", type=["xlsx"])
+    upload_types = [extension.lstrip('.') for extension in SUPPORTED_EXTENSIONS]
+    uploaded_scores_file = st.file_uploader("Upload Candidate Scores File (Excel, CSV or Parquet)", type=upload_types)
+    uploaded_comments_file = st.file_uploader("Upload Assessor Comments File (Excel, CSV or Parquet)", type=upload_types)
+
+    st.divider()
+
+    # Generation Settings
+    st.subheader("4. Generation Settings")
+    generation_mode = st.radio(
+        "Generation Mode",
+        ["Gemini reports", "Draft only (offline)"],
+        help="Draft only builds reports locally from the scores and assessor comments with the rule engine. No API key or API calls are needed."
+    )
+    draft_only = generation_mode == "Draft only (offline)"
+    use_rule_facts = st.checkbox(
+        "Send precomputed facts to Gemini",
+        value=True,
+        help="Computes the opening sentence, competency picks and matrix wording locally and sends those instead of the full level matrix."
+    )
+    max_workers = st.slider(
+        "Concurrent Requests",
+        min_value=1,
+        max_value=16,
+        value=4,
+        help="How many candidates are generated in parallel. Lower this if you hit API rate limits."
+    )
+    fallback_model = st.selectbox(
+        "Fallback Model",
+        ["None"] + [model for model in MODEL_PRICING if model != MODEL_NAME],
+        help=f"Used when every key is throttled or out of quota for {MODEL_NAME}. Fallback reports are marked in the 'model' column and are not cached."
+    )
+    requests_per_minute = st.number_input(
+        "Requests per Minute Limit",
+        min_value=0,
+        value=0,
+        step=10,
+        help="Your Gemini project's RPM quota, per key and model. Requests are paced to stay under it. 0 means no limit (429 responses still slow the run down)."
+    )
+    tokens_per_minute = st.number_input(
+        "Input Tokens per Minute Limit",
+        min_value=0,
+        value=0,
+        step=100000,
+        help="Your Gemini project's TPM quota per key and model, paced using estimated prompt tokens. 0 means no limit."
+    )
+    batch_size = st.number_input(
+        "Candidates per Request",
+        min_value=1,
+        max_value=25,
+        value=1,
+        help="Packs several candidates into one structured (JSON) request to cut request count and repeated prompt tokens. "
+             "Candidates missing from a batched response are retried on their own."
+    )
+    max_corrections = st.number_input(
+        "Corrective Retries per Candidate",
+        min_value=0,
+        max_value=3,
+        value=1,
+        help="Each report is checked against the Appendix rules (word count, bullets, competency names, numbers, forbidden words, pronouns). "
+             "Failing candidates are re-requested on their own with the issues listed, up to this many times. 0 turns the check off."
+    )
+    stream_responses = st.checkbox(
+        "Stream responses live",
+        value=True,
+        help="Shows each report's text as Gemini writes it (single-candidate requests only). Untick if a proxy blocks streamed responses."
+    )
+    bypass_cache = st.checkbox(
+        "Bypass response cache",
+        value=False,
+        help="Regenerate every candidate even if an identical prompt was answered before or completed in an earlier run "
+             "(implies not resuming). Fresh responses still update the cache."
+    )
+    resume_run = st.checkbox(
+        "Resume previous run",
+        value=True,
+        help="Skips candidates already completed in an earlier run on the same files (e.g. after a crash, timeout or browser refresh). "
+             "Untick to start the run over. Ignored when the response cache is bypassed."
+    )
 
 # --- Main Panel for Report Generation ---
 if uploaded_scores_file and uploaded_comments_file:
     try:
-        scores_df = pd.read_excel(uploaded_scores_file, engine='openpyxl')
-        comments_df = pd.read_excel(uploaded_comments_file, engine='openpyxl')
+        scores_df, scores_load_stats = load_upload(uploaded_scores_file)
+        comments_df, comments_load_stats = load_upload(uploaded_comments_file)
+
+        with st.expander("Debug: upload cache and load timings"):
+            st.dataframe(pd.DataFrame([scores_load_stats, comments_load_stats]), hide_index=True)
+            template_sizes_kb = [round(len(data) / 1024, 1) for data in (sample_scores_data, sample_comments_data)]
+            st.caption(f"Templates are built once per process and memoized ({template_sizes_kb[0]} KB + {template_sizes_kb[1]} KB).")
+
+        # --- Up-front schema validation: every problem row is reported before any API call ---
+        upload_problems = check_uploads(
+            (scores_load_stats['content hash'], comments_load_stats['content hash']), scores_df, comments_df,
+            (uploaded_scores_file.name, uploaded_comments_file.name)
+        )
+        upload_errors = has_errors(upload_problems)
+        if upload_errors:
+            st.error(f"The uploaded files have {int((upload_problems['severity'] == 'error').sum())} errors. Fix every row listed below and upload the files again.")
+        elif not upload_problems.empty:
+            st.warning(f"The uploaded files have {len(upload_problems)} warnings. Reports can be generated, but check the rows listed below.")
+        if not upload_problems.empty:
+            st.dataframe(upload_problems.astype(str), hide_index=True)
 
         st.header("Generate All Summaries")
-        st.info(f"Found **{len(scores_df['name'].unique())}** candidates in the uploaded files. Click the button below to generate all reports.")
+        if not upload_errors:
+            st.info(f"Found **{len(scores_df['name'].unique())}** candidates in the uploaded files. Click the button below to generate all reports.")
         
-        if st.button("✨ Generate All Summaries", type="primary"):
-            if not gemini_api_key:
+        if st.button("✨ Generate All Summaries", type="primary", disabled=upload_errors):
+            if not gemini_api_keys and not draft_only:
                 st.error("Please enter your Gemini API key in the sidebar to proceed.")
             else:
-                all_summaries = []
-                skipped_candidates = []
-                candidate_list = scores_df['name'].unique()
-                progress_bar = st.progress(0)
-                
-                for i, candidate_name in enumerate(candidate_list):
-                    with st.spinner(f"Generating report for {candidate_name} ({i+1}/{len(candidate_list)})..."):
-                        
-                        # --- Data Validation and Preparation ---
-                        strength_df = comments_df[(comments_df['name'] == candidate_name) & (comments_df['comment_type'] == 'Strength')]
-                        dev_df = comments_df[(comments_df['name'] == candidate_name) & (comments_df['comment_type'] == 'Development Area')]
-
-                        # Check if comments exist before proceeding
-                        if strength_df.empty or dev_df.empty:
-                            skipped_candidates.append(candidate_name)
-                            progress_bar.progress((i + 1) / len(candidate_list))
-                            continue # Skip to the next candidate
-                        
-                        candidate_data = scores_df[scores_df['name'] == candidate_name].iloc[0].to_dict()
-                        strength_comments = strength_df.iloc[0].to_dict()
-                        dev_comments = dev_df.iloc[0].to_dict()
-
-                        # --- Master Prompt ---
-                        master_prompt = """You are an expert talent management consultant. Your task is to generate a concise and insightful leadership potential summary based on a candidate's assessment data. The output must be professional, behavioral, and strictly adhere to the format and rules outlined in the Appendix.
-
-First, learn from these high-quality examples (golden standards):
-
-EXAMPLE 1
-
-INPUT DATA:
-
-First Name: Ayesha, Gender: Female, Level: Guide
-
-Scores: Overall_Leadership: 2.97, Drives_Results: 3.0, Leads_People: 3.2, Manages_Stakeholders: 2.4, Thinks_Strategically: 3.4, Solves_Challenges: 3.9, Steers_Change: 2.9
-
-Strength Comment (Solves_Challenges): The candidate demonstrates strong ability to identify issues proactively and develop effective, logical solutions.
-
-Strength Comment (Thinks_Strategically): The candidate demonstrates a solid understanding of both short-term and long-term strategic approaches to projects.
-
-Development Comment (Manages_Stakeholders): The candidate would benefit from ensuring that the mutual objectives of relevant stakeholders are aligned and supported, to secure buy-in and sustain long-lasting relationships.
-
-Development Comment (Steers_Change): The candidate would benefit from proactively seeking to understand the underlying reasons for change, to better sustain team motivation and engagement throughout the change process.
-
-CORRECT OUTPUT:
-Ayesha demonstrates average potential for growth and success in a more complex role. A confident and resilient problem-solver, she navigates ambiguity well and shows an awareness of the bigger picture. While she is adaptable to change and supports others' development, her drive to achieve goals can be inconsistent, and she may need support to remain decisive during uncertainty. Her primary development area is in stakeholder engagement, where she would benefit from building stronger, more collaborative relationships.
-
-**Strengths:**
-
-*   Demonstrates strong ability to identify issues proactively and develop effective, logical solutions.
-*   Demonstrates a solid understanding of both short-term and long-term strategic approaches to projects.
-
-**Development Areas:**
-
-* Could benefit from ensuring that the mutual objectives of relevant stakeholders are aligned and supported, to secure buy-in and sustain long-lasting relationships.
-
-* Would benefit from proactively seeking to understand the underlying reasons for change to better sustain team motivation.
-
-EXAMPLE 2
-
-INPUT DATA:
-
-First Name: Badreyah, Gender: Female, Level: Apply
-
-Scores: Overall_Leadership: 3.66, Drives_Results: 3.9, Leads_People: 4.2, Manages_Stakeholders: 4.2, Thinks_Strategically: 3.9, Solves_Challenges: 3.9, Steers_Change: 4.3
-
-Strength Comment (Steers_Change): The candidate demonstrated strong comfort with changing environments and is supportive of adopting change initiatives.
-
-Strength Comment (Leads_People): The candidate demonstrates high effectiveness in collaborating with the team to develop solutions and achieve shared goals.
-
-Development Comment (Thinks_Strategically): Minimal development could be orientated towards improving task prioritization and effectively allocating workload to focus on strategically important activities.
-
-Development Comment (Manages_Stakeholders): Minor development could be focused on developing strategies to maintain key relationships over the long term that support sustained business outcomes.
-
-CORRECT OUTPUT:
-Badreyah demonstrates high potential for growth and success in a more complex role. She excels in changing and complex environments, showing great adaptability and decisiveness. A natural leader, she inspires others and builds strong, trust-based relationships while focusing on team development. Badreyah consistently demonstrates high motivation to achieve results, approaches her work with a strategic focus on the bigger picture, and solves challenges with confidence. Her development can focus on scaling these impressive strengths for even greater complexity.
-
-**Strengths:**
-
-* Demonstrated strong comfort with changing environments and is supportive of adopting change initiatives.
-
-* Demonstrates a high level of confidence in building relationships and understanding the needs of others.
-
-Development Areas:
-
-* Development could be orientated towards improving task prioritization and effectively allocating workload to focus on strategically important activities.
-
-* Could focus on developing strategies to maintain key relationships over the long term that support sustained business outcomes.
-
-Now, using the rules and interpretation matrices in the Appendix below, generate a report for the new candidate data provided.
-
-CANDIDATE DATA TO PROCESS:
-
-First Name: {name}
-
-Gender: {gender}
-
-Level: {level}
-
-Scores:
-
-Overall_Leadership: {Overall_Leadership}
-
-Drives_Results: {Drives_Results}
-
-Leads_People: {Leads_People}
-
-Manages_Stakeholders: {Manages_Stakeholders}
-
-Thinks_Strategically: {Thinks_Strategically}
-
-Solves_Challenges: {Solves_Challenges}
-
-Steers_Change: {Steers_Change}
-
-Assessor Strength Comments:
-
-Drives_Results: {s_Drives_Results}
-
-Leads_People: {s_Leads_People}
-
-Manages_Stakeholders: {s_Manages_Stakeholders}
-
-Thinks_Strategically: {s_Thinks_Strategically}
-
-Solves_Challenges: {s_Solves_Challenges}
-
-Steers_Change: {s_Steers_Change}
-
-Assessor Development Area Comments:
-
-Drives_Results: {d_Drives_Results}
-
-Leads_People: {d_Leads_People}
-
-Manages_Stakeholders: {d_Manages_Stakeholders}
-
-Thinks_Strategically: {d_Thinks_Strategically}
-
-Solves_Challenges: {d_Solves_Challenges}
-
-Steers_Change: {d_Steers_Change}
-
-APPENDIX: RULES AND MATRICES
-1. Output Structure
-Your final output must contain two parts:
-
-Summary Paragraph: A single paragraph.
-
-Bulleted Points: Two strengths and two development areas, each as a single-sentence bullet point.
-
-Word count: the total word count of summary paragraph and bulleted points should strictly be less than 150 words, there should no deviation from this rule.
-
-As it has markdown formatting for strengths and development actions and the bullet points in them follow that as well. 
-
-2. Generation Process and Rules
-Follow this sequential process precisely.
-
-Step 1: The Opening Sentence
-Begin the summary paragraph with the sentence that corresponds exactly to the candidate's Overall_Leadership score, using the "Overall Leadership Potential Matrix" below. Use the candidate's first name.
-
-Step 2: The Summary Paragraph Narrative
-After the opening sentence, construct a narrative paragraph by performing the following:
-
-Identify the candidate's Level (Apply, Guide, or Shape) to select the correct interpretation matrix.
-
-Identify the 2-3 highest-scoring and 2-3 lowest-scoring of the six core competencies.
-
-Weave a narrative that describes the candidate's profile. Start with the themes from the highest-scoring competencies, followed by the lower-scoring areas to provide a balanced view.
-
-For each competency described, use the exact wording from the corresponding interpretation matrix. Do not name the competencies.
-
-Crucially, conclude the paragraph by explicitly identifying the primary development area(s). For most profiles, use phrases like 'Her primary development area is...' or 'His development can focus on...'. For high-performing candidates with all high scores, frame this positively, such as 'Her development can focus on scaling these impressive strengths for even greater complexity.'
-
-Ensure the paragraph flows naturally. The entire paragraph must be approximately 150 words.
-
-Step 3: Bullet Point Selection
-
-Strengths: Identify the two highest-scoring of the six core competencies. If there is a tie, select the competency with the most specific and behavioral strength comment from the assessor notes. Scores of 3.5 or above are always considered strengths.
-
-Development Areas: Identify the two lowest-scoring of the six core competencies. Scores of 2.49 or below are always considered development areas. If all scores are high (e.g., above 3.5), select the two competencies with the relatively lowest scores. If assessor comments are minimal for the lowest score, you may select the next lowest score if its comment is more specific and actionable.
-
-Step 4: Bullet Point Writing
-
-For each of the four selected competencies, use the corresponding assessor comment as your source.
-
-Rephrase the assessor comment into a single, concise, behavioral sentence. For strengths, use the "Strengths" comment. For development areas, use the "Development Areas" comment.
-
-The bullet points must provide specific behavioral evidence and should not be general statements.
-
-3. Writing Style and Constraints
-Tone: Neutral, professional, objective, and behavioral.
-
-Voice: Third person, present tense only (e.g., "She demonstrates," "He approaches").
-
-Language: American English.
-
-Forbidden Terms: Do not use the names of the competencies (e.g., "Drives Results"). Do not mention scores, numbers, AI, assessments, tools, or the assessment experience. Avoid vague or judgmental words like "good," "poor," "struggles," "strong," or "weak," unless they are part of the required interpretation text.
-
-Pronouns: Use the candidate's correct gender pronouns.
-
-4. Interpretation Matrices
-Overall Leadership Potential Matrix
-| Score Range | Interpretation |
-| :--- | :--- |
-| 3.50 - 5.00 | [First Name] demonstrates high potential for growth and success in a more complex role. |
-| 3.00 - 3.49 | [First Name] demonstrates above average potential for growth and success in a more complex role. |
-| 2.50 - 2.99 | [First Name] demonstrates average potential for growth and success in a more complex role. |
-| 1.00 - 2.49 | [First Name] demonstrates low potential for growth and success in a more complex role. |
-
-"APPLY" Level Interpretation Matrix
-| Competency | High (3.5-5.0) | Moderate (2.5-3.49) | Low (1.0-2.49) |
-| :--- | :--- | :--- | :--- |
-| Drives Results | Consistently demonstrates high motivation and initiative to exceed expectations. A strong drive to achieve goals, targets, and results. Seeks fulfillment through impact. Drives a high-performance culture across teams and demonstrates grit and persistence when working toward ambitious targets. | Demonstrates motivation and takes initiative occasionally. Demonstrates a drive to achieve goals, but may need support. Interest in making an impact is present but not sustained. Moderate ability to articulate performance standards that contribute to achieving organisational goals. Occasionally supports performance across teams and shows persistence when working towards goals. | Demonstrates limited motivation or initiative; may meet expectations but does not show a consistent drive to exceed them. Fulfillment from work or desire to make an impact is not clearly evident. Low ability to articulate performance standards that support organisational goals. Needs development in fostering a high-performance culture and in maintaining persistence when faced with challenging goals. |
-| Leads People | Consistently takes time to focus on both personal and professional growth - for both self and others. Actively pursues continuous improvement and excellence; shows clear willingness to learn and unlearn. Strongly supports development of others by identifying and leveraging individual strengths. Advocates for learning and career growth, contributing to a culture of learning and continuous improvement. | Focuses on personal and professional growth for self and others and engages in learning activities but may not do so consistently. Displays willingness to learn and unlearn. Recognizes others’ development needs and offers support, though may not consistently nurture growth or advocate for talent advancement. | Has an opportunity to focus more on personal and professional growth for self and others. Can increase engagement in learning activities and become more receptive to feedback. Would benefit from taking a greater interest in developing others and contributing to a learning environment. |
-| Manages Stakeholders| Consistently shows capability to lead and inspire others. Displays strong empathy, understanding, and a focus on people. Builds relationships with ease and enjoys social interaction. Demonstrates strong ability to engage key stakeholders, build trust-based relationships, and find synergies for mutual outcomes. Proactively networks and stays connected across internal and external touchpoints. | Displays some ability to lead and inspire others. May show empathy and focus on people inconsistently. Moderate ability to maintain and build relationships with key stakeholders. Often identifies synergies for positive outcomes. Occasionally proactively networks. | Demonstrates limited capability in leading or inspiring others. Social interaction may be minimal or strained. Struggles to build and maintain relationships. Rarely engages with stakeholders and does not leverage relationships for mutual outcomes. Limited presence in networks or cross-functional collaboration. |
-| Thinks Strategically| Approaches work with a strong focus on the bigger picture. Operates independently with minimal guidance. Demonstrates a commercial and strategic mindset, regularly anticipating trends and their impact. Effectively balances short-term goals with long-term organizational value. Translates complex goals into clear team actions and helps others understand broader implications. | Demonstrates some awareness of the bigger picture but may need occasional guidance. Understands strategy in parts but may not consistently anticipate trends or broader implications. Occasionally translates organisational goals into meaningful actions. Can focus on both immediate and longer-term needs but may favor one over the other. | Focus tends to be on immediate tasks, creating an opportunity to develop a greater awareness of the bigger picture. Benefits from guidance to connect daily work with the broader strategic direction. Development can be focused on translating organizational priorities into meaningful actions. |
-| Solves Challenges | Consistently addresses problems and challenges with confidence and resilience. Takes a diligent, practical, and solution-focused approach. Comfortable navigating ambiguity and complexity. Makes sound decisions under pressure and thrives in environments with multiple demands. | Has the ability to address problems but may need time or support to build confidence and resilience. Attempts a practical approach but not always solution-focused. Moderate ability to handle ambiguity and complex envrionments. Shows some confidence in leading through uncertain environments. | Struggles to address problems confidently. May rely heavily on others. Practical or solution-oriented approaches are limited. Avoids complexity and ambiguity. Rarely takes initiative in resolving obstacles. |
-| Steers Change | Thrives in change and complexity. Manages new ways of working with adaptability, flexibility, and decisiveness during change. Plays an active role in transformation initiatives, shows strong resilience, and enables buy-in and alignment from others during change. | Demonstrates ability to cope with change and can adapt when needed. May need support to remain flexible or decisive in uncertain situations. Contributes to organisational change initiatives, may enable buy-in and shows resilience during challenging times. | Struggles with change or uncertainty. May resist new ways of working and has difficulty adapting or deciding in changing circumstances. Rarely contributes to transformation efforts and finds it difficult to stay resilient under shifting demands. Has difficulty enabling buy-in and support. |
-
-"GUIDE" Level Interpretation Matrix
-| Competency | High (3.5-5.0) | Moderate (2.5-3.49) | Low (1.0-2.49) |
-| :--- | :--- | :--- | :--- |
-| Drives Results | Consistently demonstrates high motivation and initiative to exceed expectations. A strong drive to achieve goals, targets, and results. Seeks fulfillment through impact. Supports and guides team to deliver goals on time. Recognizes high performance, addresses underperformance, displays grit, and manages resources effectively. | Demonstrates motivation and takes initiative occasionally. Demonstrates a drive to achieve goals, but may need support. Interest in making an impact is present but not sustained. Supports team delivery but may need prompting. Occasionally recognizes performance and addresses underperformance. Shows some grit and manages resources with support. | Demonstrates limited motivation or initiative; may meet expectations but does not show a consistent drive to exceed them. Fulfillment from work or desire to make an impact is not clearly evident. Limited support for team delivery. Rarely recognizes performance or addresses underperformance. Struggles with grit and resource management. |
-| Leads People | Consistently takes time to focus on both personal and professional growth - for both self and others. Actively pursues continuous improvement and excellence; shows clear willingness to learn and unlearn. Coaches key talent with timely, constructive feedback. Builds capability by offering challenging development opportunities. | Focuses on personal and professional growth for self and others and engages in learning activities but may not do so consistently. Displays willingness to learn and unlearn. Provides feedback and guidance, though not always timely or targeted. Offers some development opportunities, but impact may vary. | Has an opportunity to focus more on personal and professional growth. Would benefit from providing more consistent, meaningful feedback. Development can focus on coaching talent effectively and building individual capability through challenging opportunities. |
-| Manages Stakeholders| Consistently shows capability to lead and inspire others. Displays strong empathy, understanding, and a focus on people. Builds relationships with ease and enjoys social interaction. Builds strong relationships to achieve team goals. Understands stakeholder interests and creates long-term partnerships through relationship-building efforts. | Displays some ability to lead and inspire others. May show empathy and focus on people inconsistently. Moderate ability to maintain and build relationships with key stakeholders. Builds relationships when needed to meet goals. Some awareness of stakeholder interests. Maintains connections, but may not actively deepen them. | Demonstrates limited capability in leading or inspiring others. Social interaction may be minimal or strained. Struggles to build and maintain relationships. Engages with stakeholders minimally. Limited understanding of mutual interests. Rarely invests in building or maintaining long-term relationships. |
-| Thinks Strategically| Approaches work with a strong focus on the bigger picture. Operates independently with minimal guidance. Demonstrates a commercial and strategic mindset, regularly anticipating trends and their impact. Considers both short- and long-term impact of decisions. Translates departmental strategy into clear, meaningful actions for self and others. | Demonstrates some awareness of the bigger picture but may need occasional guidance. Understands strategy in parts but may not consistently anticipate trends or broader implications. Acknowledges short- and long-term implications, though not always fully. Can link strategy to actions but may need support or clarification. | Focus tends to be on immediate tasks, creating an opportunity to develop a greater awareness of the bigger picture. Benefits from guidance to connect work with strategic direction. Development can be focused on anticipating trends and turning departmental strategy into clear actions. |
-| Solves Challenges | Consistently addresses problems and challenges with confidence and resilience. Takes a diligent, practical, and solution-focused approach. Manages conflicting departmental and people priorities effectively and consistently weighs them when making decisions. | Has the ability to address problems but may need time or support to build confidence and resilience. Attempts a practical approach but not always solution-focused. Manages departmental and people priorities but may not always weigh them evenly when making decisions. | Struggles to address problems confidently. May rely heavily on others. Practical or solution-oriented approaches are limited. Struggles to manage conflicting priorities and rarely weighs them appropriately when making decisions. |
-| Steers Change | Thrives in change and complexity. Manages new ways of working with adaptability, flexibility, and decisiveness during change. Acts as a role model for positive change, inspiring others and clearly translating the change journey into defined actions. | Demonstrates ability to cope with change and can adapt when needed. May need support to remain flexible or decisive in uncertain situations. Supports change efforts and sometimes inspires others, but may need help translating the journey into clear actions. | Struggles with change or uncertainty. May resist new ways of working and has difficulty adapting or deciding in changing circumstances. Rarely acts as a role model for change and struggles to inspire or define clear actions in the change journey. |
-
-"SHAPE" Level Interpretation Matrix
-| Competency | High (3.5-5.0) | Moderate (2.5-3.49) | Low (1.0-2.49) |
-| :--- | :--- | :--- | :--- |
-| Drives Results | Consistently demonstrates high motivation and initiative to exceed expectations. A strong drive to achieve goals, targets, and results. Seeks fulfillment through impact. High focus on achieving outcomes against set targets and delivers consistent performance to exceed own goals. Shows perseverance and determination to achieve tasks and goals despite challenges. | Demonstrates motivation and takes initiative occasionally. Demonstrates a drive to achieve goals, but may need support. Interest in making an impact is present but not sustained. Moderate focus on outcomes and performance tracking; may occasionally lack focus. Shows perseverance to achieve tasks but may require support in overcoming setbacks or challenges. | Demonstrates limited motivation or initiative; may meet expectations but does not show a consistent drive to exceed them. Fulfillment from work or desire to make an impact is not clearly evident. Low focus on outcomes; may not track performance against goals consistently. There may be a lack of perseverance and problem-solving when faced with setbacks. |
-| Leads People | Consistently takes time to focus on both personal and professional growth - for both self and others. Actively pursues continuous improvement and excellence; shows clear willingness to learn and unlearn. Strong ability to resolve problems with team members proactively and achieve common goals. Makes contributions on a continual basis, creates trust and teamwork. | Focuses on personal and professional growth and engages in learning activities but may not do so consistently. Moderate openness to learning and unlearning. Cooperates with team members in most situations but may need guidance to work through conflicts. Makes contributions intermittently and may not always address conflicts when they arise. | Has an opportunity to focus more on personal and professional growth and become more receptive to learning. Would benefit from working more collaboratively to resolve conflicts and achieve common goals. Can increase contributions to build trust within the team. |
-| Manages Stakeholders| Consistently shows capability to lead and inspire others. Displays strong empathy, understanding, and a focus on people. Builds relationships with ease and enjoys social interaction. Strong ability to identify and build relationships and connections. Understands stakeholder needs and mutual interests. Works to build long-term relationships. | Displays some ability to lead and inspire others. May show empathy and focus on people but not consistently. Builds relationships but may need support. May have only partial understanding of stakeholder needs and mutual interests. Works to build long-term relationships but may be inconsistent. | Demonstrates limited capability in leading or inspiring others. Social interaction may be minimal or strained. Struggles to build and maintain relationships. Demonstrates limited understanding of stakeholder needs or interdependencies, and does not work to build long-term relationships. |
-| Thinks Strategically| Approaches work with a strong focus on the bigger picture. Operates independently with minimal guidance. Demonstrates a commercial and strategic mindset, regularly anticipating trends and their impact. Understands potential risks and seeks guidance to address the issues. Strong ability to revise strategies based on team needs while prioritising tasks accordingly in order to meet set deadlines. | Demonstrates awareness of the bigger picture but may need occasional guidance. Understands strategy in parts but may not consistently anticipate trends or broader implications. Can identify risks with some guidance and seeks input occasionally to address issues. Demonstrates some ability to revise plans but may need reminders to prioritise effectively. | Focus tends to be on immediate tasks, creating an opportunity to develop a greater awareness of the bigger picture. Benefits from guidance to align goals with team direction and recognize potential risks. Development can focus on addressing issues and revising plans with greater independence. |
-| Solves Challenges | Consistently addresses problems and challenges with confidence and resilience. Takes a diligent, practical, and solution-focused approach to solving issues. Will likely remain composed in the face of setbacks and approach problems with a positive “can do” attitude. | Demonstrates ability to address problems but may need support or time to build confidence and resilience. Attempts a practical approach but not always solution-focused. Moderate ability to identify issues proactively, and takes action when promoted. Sometimes may struggle to remain composed under pressure. | Struggles to address problems confidently. May rely heavily on others and may not take a practical or solution-oriented approach. Does not prioritise working with others to solve problems and identify solutions. Struggles to remain composed under pressure or maintain a positive approach. |
-| Steers Change | Thrives in change and complexity in the workplace. Manages new ways of working with adaptability, flexibility, and decisiveness during uncertainty. Supports implementation of new change initiatives and takes appropriate follow-up action. | Generally copes with change and can adapt when needed. May need support to remain flexible or decisive in uncertain situations. Operates with a degree of comfort when facts are not fully available and support change initiatives, but follow-up action may be delayed or inconsistent. | Struggles with change or uncertainty. May resist new ways of working and has difficulty adapting or deciding in changing circumstances. May be uncomfortable operating when facts are unclear and is unlikely to support change initiatives. |
-"""
-                        # --- Create a single dictionary with all keys transformed to use underscores ---
-                        format_dict = {}
-                        for k, v in candidate_data.items():
-                            format_dict[k.replace(' ', '_')] = v
-                        for k, v in strength_comments.items():
-                            format_dict[f"s_{k.replace(' ', '_')}"] = v
-                        for k, v in dev_comments.items():
-                            format_dict[f"d_{k.replace(' ', '_')}"] = v
-
-                        # --- Dynamically insert candidate data into the prompt ---
-                        final_prompt = master_prompt.format(**format_dict)
-                        
-                        # --- Live API Call ---
-                        report_text = call_gemini_api(final_prompt, gemini_api_key)
-                        all_summaries.append({'name': candidate_name, 'summary': report_text})
-                        
-                        # Update progress bar
-                        progress_bar.progress((i + 1) / len(candidate_list))
-
-                st.success("All summaries have been generated successfully!")
-                
-                if skipped_candidates:
-                    st.warning(f"The following candidates were skipped due to missing comment data: {', '.join(skipped_candidates)}")
-
-                # --- Create and provide download link for the results ---
-                results_df = pd.DataFrame(all_summaries)
-                
-                output_results = io.BytesIO()
-                with pd.ExcelWriter(output_results, engine='openpyxl') as writer:
-                    results_df.to_excel(writer, index=False, sheet_name='Generated Summaries')
-                processed_results = output_results.getvalue()
-
-                st.dataframe(results_df)
-
-                st.download_button(
-                    label="⬇️ Download All Summaries (.xlsx)",
-                    data=processed_results,
-                    file_name="all_candidate_summaries.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                # --- Hand the cohort to the background executor; this script run returns straight away ---
+                run_id = None if draft_only else make_run_id(
+                    uploaded_scores_file.getvalue(), uploaded_comments_file.getvalue(), MODEL_NAME, use_rule_facts
+                )
+                models = (MODEL_NAME,) if fallback_model == "None" else (MODEL_NAME, fallback_model)
+                job_options = {
+                    'draft_only': draft_only, 'run_id': run_id, 'resume_run': resume_run, 'use_rule_facts': use_rule_facts,
+                    'api_key': gemini_api_keys[0] if gemini_api_keys else '', 'max_workers': max_workers,
+                    'batch_size': batch_size, 'max_corrections': max_corrections, 'bypass_cache': bypass_cache,
+                    'stream_responses': stream_responses,
+                    'client': None if draft_only else get_gemini_client(gemini_api_keys, models, requests_per_minute, tokens_per_minute),
+                }
+                # Keyed by the run ID, so the same files submitted twice (another session, a double click) share one job
+                job_id = get_job_manager().submit(
+                    f"{uploaded_scores_file.name} + {uploaded_comments_file.name}", run_report_job,
+                    scores_df, comments_df, job_options, key=run_id
                 )
+                if job_id not in st.session_state.job_ids:
+                    st.session_state.job_ids.append(job_id)
+                st.success(f"Job `{job_id}` is processing these files in the background. Its progress is shown below; keep the job ID to reopen it after a refresh.")
 
     except Exception as e:
         st.error(f"An error occurred while processing the files: {e}")
@@ -427,3 +421,24 @@ Overall Leadership Potential Matrix
 
 else:
     st.info("Please upload both the scores and comments Excel files and provide your API key in the sidebar to begin.")
+
+# --- Background jobs started from this session (or reopened by ID) ---
+job_manager = get_job_manager()
+with st.sidebar:
+    st.divider()
+    reopen_job_id = st.text_input("Reopen a Job by ID", help="Jobs keep running if the page is refreshed or closed. Paste a job ID to follow it again.").strip()
+    if reopen_job_id and reopen_job_id not in st.session_state.job_ids:
+        if job_manager.get(reopen_job_id) is not None:
+            st.session_state.job_ids.append(reopen_job_id)
+        else:
+            st.error(f"No job with ID `{reopen_job_id}` is running or recently finished on this server.")
+
+session_jobs = [job for job in map(job_manager.get, reversed(st.session_state.job_ids)) if job is not None]
+if session_jobs:
+    st.header("Report Jobs")
+    active_job_ids = [job.job_id for job in session_jobs if not job.finished]
+    if active_job_ids:
+        active_jobs_panel(job_manager, active_job_ids)
+    for job in session_jobs:
+        if job.finished:
+            render_finished_job(job)
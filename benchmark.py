@@ -0,0 +1,189 @@
+"""Offline benchmarks of the generation pipeline against the local mock Gemini server.
+
+Runs the same steps as the app's "Generate All Summaries" handler (prepare, rule engine facts, prompt
+building, concurrent generation) on synthetic cohorts built from the sample templates, and reports
+throughput, tail latency, peak memory and end-to-end time. No real API quota is used.
+
+Examples:
+    python benchmark.py                                   # 10, 1k and 10k candidates
+    python benchmark.py --sizes 1000 --workers 32 --batch-size 5 --error-rate-429 0.02
+    python benchmark.py --save baseline.json
+    python benchmark.py --baseline baseline.json --max-regression 0.15   # exit 1 on regression
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+from gemini_client import GeminiDispatcher
+from generation import MODEL_NAME, GenerationOptions, build_jobs, generate_reports, prepare_candidates
+from mock_gemini_server import MockGeminiConfig, MockGeminiServer
+from rule_engine import compute_report_facts
+from sample_data import sample_frames
+from telemetry import RunTelemetry
+
+DEFAULT_SIZES = [10, 1000, 10000]
+
+# Metrics compared against a baseline; True means higher is better
+REGRESSION_METRICS = {
+    'throughput (candidates/s)': True,
+    'end-to-end (s)': False,
+    'latency p95 (ms)': False,
+    'latency p99 (ms)': False,
+    'peak memory (MB)': False,
+}
+
+
+def synthetic_cohort(size):
+    """Builds scores and comments frames for size candidates by cycling through the sample template rows.
+
+    Sample candidates without comments are kept, so the skip path is exercised like in real exports.
+    """
+    scores_df, comments_df = sample_frames()
+    templates = scores_df.to_dict('records')
+    scores_rows = []
+    comments_rows = []
+    for i in range(size):
+        template = templates[i % len(templates)]
+        name = f"{template['name']}_{i:05d}"
+        scores_rows.append(dict(template, name=name))
+        for comment in comments_df[comments_df['name'] == template['name']].to_dict('records'):
+            comments_rows.append(dict(comment, name=name))
+    return pd.DataFrame(scores_rows), pd.DataFrame(comments_rows, columns=comments_df.columns)
+
+
+def run_pipeline(scores_df, comments_df, client, workers, batch_size, use_rule_facts=True, stream=False, max_corrections=0):
+    """Runs the app's generation pipeline and returns (results, skipped candidates, telemetry, seconds to first report)."""
+    telemetry = RunTelemetry(MODEL_NAME)
+    first_report_at = []
+
+    def on_complete(candidate_name, finished_count, summary):
+        if not first_report_at:
+            first_report_at.append(time.perf_counter())
+
+    prepared_candidates, skipped_candidates = prepare_candidates(scores_df, comments_df)
+    report_facts = compute_report_facts(scores_df)
+    jobs, _ = build_jobs(prepared_candidates, report_facts, use_rule_facts, telemetry=telemetry)
+    results = generate_reports(jobs, 'mock-api-key', GenerationOptions(
+        workers, batch_size, max_corrections, client=client, telemetry=telemetry, on_complete=on_complete,
+        on_partial=(lambda candidate_name, text: None) if stream else None
+    ))
+    telemetry.finish()
+    first_report_seconds = first_report_at[0] - telemetry.started if first_report_at else 0.0
+    return results, skipped_candidates, telemetry, first_report_seconds
+
+
+def benchmark_size(size, args, base_url):
+    scores_df, comments_df = synthetic_cohort(size)
+    client = GeminiDispatcher(
+        [f"mock-api-key-{number}" for number in range(args.keys)], [MODEL_NAME] + args.fallback_model,
+        requests_per_minute=args.rpm, tokens_per_minute=args.tpm, pool_size=max(32, args.workers), base_url=base_url
+    )
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    results, skipped_candidates, telemetry, first_report_seconds = run_pipeline(
+        scores_df, comments_df, client, args.workers, args.batch_size, not args.no_facts, args.stream,
+        args.max_corrections
+    )
+    elapsed = time.perf_counter() - started
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    summary = telemetry.summary()
+    return {
+        'candidates': size,
+        'generated': len(results),
+        'skipped': len(skipped_candidates),
+        'errors': summary['errors'],
+        'end-to-end (s)': round(elapsed, 2),
+        'first report (s)': round(first_report_seconds, 2),
+        'first text (ms)': summary['avg time to first text (ms)'],
+        'throughput (candidates/s)': round(len(results) / elapsed, 1) if elapsed > 0 else 0.0,
+        'latency p50 (ms)': summary['HTTP latency p50 (ms)'],
+        'latency p95 (ms)': summary['HTTP latency p95 (ms)'],
+        'latency p99 (ms)': summary['HTTP latency p99 (ms)'],
+        'retries': summary['total retries'],
+        'corrections': summary['corrective re-requests'],
+        'throttled (429)': client.throttle_count,
+        'prompt tokens': summary['prompt tokens'],
+        'peak memory (MB)': round(peak_bytes / 1024 / 1024, 1),
+    }
+
+
+def find_regressions(results, baseline, max_regression):
+    """Returns a message for every metric that is worse than the baseline by more than max_regression."""
+    baseline_by_size = {row['candidates']: row for row in baseline}
+    regressions = []
+    for row in results:
+        previous = baseline_by_size.get(row['candidates'])
+        if previous is None:
+            continue
+        for metric, higher_is_better in REGRESSION_METRICS.items():
+            old, new = previous.get(metric), row.get(metric)
+            if not old or new is None:
+                continue
+            change = (old - new) / old if higher_is_better else (new - old) / old
+            if change > max_regression:
+                regressions.append(f"{row['candidates']} candidates: {metric} {old} -> {new} ({change:.0%} worse)")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the generation pipeline against a local mock Gemini server.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Cohort sizes (default: 10 1000 10000).")
+    parser.add_argument('--workers', type=int, default=16, help="Concurrent requests (default: 16).")
+    parser.add_argument('--batch-size', type=int, default=1, help="Candidates packed per request (default: 1).")
+    parser.add_argument('--stream', action='store_true', help="Use the streaming endpoint, as the app does.")
+    parser.add_argument('--max-corrections', type=int, default=0, help="Corrective re-requests per failing report (default: 0).")
+    parser.add_argument('--no-facts', action='store_true', help="Send the full level matrix instead of precomputed facts.")
+    parser.add_argument('--keys', type=int, default=1, help="Number of (mock) API keys to spread requests over (default: 1).")
+    parser.add_argument('--fallback-model', action='append', default=[], help="Fallback model(s) after the primary one.")
+    parser.add_argument('--rpm', type=int, default=0, help="Requests-per-minute limit per key and model (default: none).")
+    parser.add_argument('--tpm', type=int, default=0, help="Tokens-per-minute limit per key and model (default: none).")
+    parser.add_argument('--latency-ms', type=float, default=50.0, help="Mock median latency (default: 50).")
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help="Mock lognormal latency spread (default: 0.5).")
+    parser.add_argument('--error-rate-429', type=float, default=0.0, help="Share of requests answered with 429.")
+    parser.add_argument('--error-rate-5xx', type=float, default=0.0, help="Share of requests answered with 503.")
+    parser.add_argument('--retry-after', type=float, default=0.5, help="Retry-After seconds sent with mock 429s.")
+    parser.add_argument('--output-tokens', type=int, default=250, help="Output tokens reported per candidate.")
+    parser.add_argument('--seed', type=int, default=42, help="Seed for the mock's latency and error draws.")
+    parser.add_argument('--save', default=None, help="Write the results to this JSON file (e.g. as a baseline).")
+    parser.add_argument('--baseline', default=None, help="Compare against a JSON file written with --save.")
+    parser.add_argument('--max-regression', type=float, default=0.2, help="Allowed relative regression (default: 0.2).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = MockGeminiConfig(
+        latency_ms=args.latency_ms, latency_sigma=args.latency_sigma, error_rate_429=args.error_rate_429,
+        error_rate_5xx=args.error_rate_5xx, retry_after=args.retry_after, output_tokens=args.output_tokens,
+        seed=args.seed,
+    )
+    results = []
+    with MockGeminiServer(config) as server:
+        for size in args.sizes:
+            print(f"Benchmarking {size} candidates...", file=sys.stderr)
+            results.append(benchmark_size(size, args, server.base_url))
+
+    print(pd.DataFrame(results).to_string(index=False))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.max_regression)
+        if regressions:
+            print("Regressions against the baseline:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            return 1
+        print("No regressions against the baseline.", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""Headless batch generation of Leadership Potential Reports.
+
+Streams the scores and comments workbooks instead of loading them whole, generates candidates chunk by
+chunk with the same prompt and API logic as the Streamlit app, and writes each finished chunk straight
+to the output file, so memory stays flat regardless of cohort size. Both files are validated first, and
+every problem row is reported before any API call is made.
+
+Example (e.g. from cron):
+    GEMINI_API_KEY=... python cli.py --scores scores.xlsx --comments comments.xlsx --output summaries.csv
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from gemini_client import GeminiDispatcher
+from generation import MODEL_NAME, GenerationOptions, build_jobs, draft_reports, generate_reports, prepare_candidates
+from ingestion import PROBLEM_COLUMNS, has_errors, iter_rows, validate_comments, validate_scores
+from report_validator import add_validation_status
+from response_cache import ResponseCache
+from rule_engine import compute_report_facts
+from run_journal import RunJournal, make_run_id
+from telemetry import RunTelemetry
+
+OUTPUT_COLUMNS = ['name', 'summary', 'validation', 'model', 'api_key']
+
+
+# --- Streaming readers ---
+def file_digest(path, block_size=1 << 20):
+    """Returns the SHA-256 digest of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.digest()
+
+
+def _to_frame(rows):
+    """Builds a DataFrame from streamed rows, with empty cells as NaN like pd.read_excel."""
+    return pd.DataFrame(rows).replace({None: np.nan, '': np.nan})
+
+
+def _with_str_name(row):
+    """Stores the name as a string, as iter_candidate_chunks does, so numeric names (e.g. employee IDs) still join."""
+    row['name'] = str(row.get('name'))
+    return row
+
+
+class CommentsIndex:
+    """Temporary on-disk SQLite index of the comments file, so comments can be joined to any chunk of scores."""
+
+    def __init__(self, comments_path):
+        self._file = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False)
+        self._file.close()
+        self._conn = sqlite3.connect(self._file.name, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE comments (name TEXT, comment_type TEXT, row_json TEXT, PRIMARY KEY (name, comment_type))"
+        )
+        # First row per name and comment type wins, as in the app
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO comments VALUES (?, ?, ?)",
+            (
+                (row['name'], str(row.get('comment_type')), json.dumps(row, default=str))
+                for row in map(_with_str_name, iter_rows(comments_path))
+            ),
+        )
+        self._conn.commit()
+
+    def lookup(self, names):
+        """Returns the comment rows for the given candidate names as a DataFrame."""
+        placeholders = ','.join('?' * len(names))
+        rows = self._conn.execute(
+            f"SELECT row_json FROM comments WHERE name IN ({placeholders})", [str(name) for name in names]
+        ).fetchall()
+        if not rows:
+            return pd.DataFrame(columns=['name', 'comment_type'])
+        return _to_frame([json.loads(row_json) for (row_json,) in rows])
+
+    def close(self):
+        self._conn.close()
+        os.remove(self._file.name)
+
+
+def validate_files(scores_path, comments_path, chunk_size):
+    """Validates both files chunk by chunk, before any API call. Returns every problem found as one DataFrame."""
+    problems = []
+    for path, validate in ((scores_path, validate_scores), (comments_path, validate_comments)):
+        rows = iter_rows(path)
+        seen = set()
+        row_offset = 0
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            problems.append(validate(_to_frame(chunk), row_offset, seen).assign(file=path))
+            row_offset += len(chunk)
+    if not problems:
+        return pd.DataFrame(columns=PROBLEM_COLUMNS)
+    # A missing column is reported once per chunk; keep one
+    return pd.concat(problems, ignore_index=True).reindex(columns=PROBLEM_COLUMNS).drop_duplicates(ignore_index=True)
+
+
+def iter_candidate_chunks(scores_path, comments_index, chunk_size):
+    """Yields (scores_df, comments_df) chunks of up to chunk_size candidates, streamed from the scores file."""
+    seen_names = set()
+    rows = []
+    for row in map(_with_str_name, iter_rows(scores_path)):
+        # Only the first scores row per candidate is used, as in the app
+        if row['name'] in seen_names:
+            continue
+        seen_names.add(row['name'])
+        rows.append(row)
+        if len(rows) == chunk_size:
+            yield _to_frame(rows), comments_index.lookup([r['name'] for r in rows])
+            rows = []
+    if rows:
+        yield _to_frame(rows), comments_index.lookup([r['name'] for r in rows])
+
+
+# --- Incremental writers ---
+class ResultsWriter:
+    """Writes result rows incrementally to .csv, .xlsx (write-only workbook) or .parquet (requires pyarrow)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows_written = 0
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.csv':
+            self._file = open(path, 'w', newline='', encoding='utf-8')
+            self._csv = csv.DictWriter(self._file, fieldnames=OUTPUT_COLUMNS)
+            self._csv.writeheader()
+            self._kind = 'csv'
+        elif extension == '.xlsx':
+            self._workbook = Workbook(write_only=True)
+            self._sheet = self._workbook.create_sheet('Generated Summaries')
+            self._sheet.append(OUTPUT_COLUMNS)
+            self._kind = 'xlsx'
+        elif extension == '.parquet':
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise SystemExit("Writing .parquet output requires pyarrow (pip install pyarrow).")
+            self._pa = pa
+            self._schema = pa.schema([(column, pa.string()) for column in OUTPUT_COLUMNS])
+            self._parquet = pq.ParquetWriter(path, self._schema)
+            self._kind = 'parquet'
+        else:
+            raise SystemExit(f"Unsupported output format '{extension}'. Use .csv, .xlsx or .parquet.")
+
+    def write(self, results):
+        results = [
+            {column: '' if result.get(column) is None else str(result[column]) for column in OUTPUT_COLUMNS}
+            for result in results
+        ]
+        if not results:
+            return
+        if self._kind == 'csv':
+            self._csv.writerows(results)
+            self._file.flush()
+        elif self._kind == 'xlsx':
+            for result in results:
+                self._sheet.append([result[column] for column in OUTPUT_COLUMNS])
+        else:
+            self._parquet.write_table(self._pa.Table.from_pylist(results, schema=self._schema))
+        self.rows_written += len(results)
+
+    def close(self):
+        if self._kind == 'csv':
+            self._file.close()
+        elif self._kind == 'xlsx':
+            self._workbook.save(self.path)
+        else:
+            self._parquet.close()
+
+
+# --- Pipeline ---
+def process_chunk(chunk, args, api_key, cache, journal, already_completed, client=None, telemetry=None):
+    """Generates one chunk of candidates and returns (results in scores order, skipped candidate names)."""
+    scores_df, comments_df = chunk
+    prepared_candidates, skipped_candidates = prepare_candidates(scores_df, comments_df)
+    report_facts = compute_report_facts(scores_df)
+
+    if args.draft_only:
+        return add_validation_status(draft_reports(prepared_candidates, report_facts), prepared_candidates), skipped_candidates
+
+    jobs, _ = build_jobs(prepared_candidates, report_facts, not args.no_facts, exclude=already_completed, telemetry=telemetry)
+    generated = generate_reports(jobs, api_key, GenerationOptions(
+        args.workers, args.batch_size, args.max_corrections, cache=cache, bypass_cache=args.bypass_cache,
+        journal=journal, client=client, telemetry=telemetry
+    ))
+    generated_by_name = {str(result['name']): result for result in generated}
+    # Candidates completed in an earlier run come from the journal, without model and key
+    results = [
+        generated_by_name.get(str(name), {'name': name, 'summary': already_completed.get(str(name))})
+        for name in prepared_candidates
+    ]
+    return add_validation_status(results, prepared_candidates), skipped_candidates
+
+
+def run(args):
+    api_keys = args.api_key or [key.strip() for key in os.environ.get('GEMINI_API_KEY', '').split(',') if key.strip()]
+    api_key = api_keys[0] if api_keys else ''
+    if not api_key and not args.draft_only:
+        raise SystemExit("A Gemini API key is required: pass --api-key or set GEMINI_API_KEY (or use --draft-only).")
+
+    problems = validate_files(args.scores, args.comments, args.chunk_size)
+    for problem in problems.itertuples():
+        location = f"row {problem.row}" if pd.notna(problem.row) else "header"
+        value = f" ({problem.value})" if pd.notna(problem.value) else ""
+        print(f"{problem.file} {location} [{problem.severity}] {problem.column}: {problem.problem}{value}", file=sys.stderr)
+    if has_errors(problems):
+        raise SystemExit(f"{int((problems['severity'] == 'error').sum())} errors found in the input files; nothing was generated.")
+
+    journal = None
+    already_completed = {}
+    if not args.draft_only:
+        journal = RunJournal(make_run_id(
+            file_digest(args.scores), file_digest(args.comments), MODEL_NAME, not args.no_facts
+        ))
+        journal.reset_unless_resuming(not args.no_resume, args.bypass_cache)
+        already_completed = journal.completed()
+        if already_completed:
+            print(f"Resuming run: {len(already_completed)} candidates already completed.", file=sys.stderr)
+    cache = None if args.draft_only else ResponseCache()
+    client = GeminiDispatcher(
+        api_keys, [MODEL_NAME] + args.fallback_model, requests_per_minute=args.rpm, tokens_per_minute=args.tpm
+    )
+    telemetry = None if args.draft_only else RunTelemetry(MODEL_NAME)
+
+    started = time.monotonic()
+    comments_index = CommentsIndex(args.comments)
+    writer = ResultsWriter(args.output)
+    skipped_total = []
+    try:
+        chunks = iter_candidate_chunks(args.scores, comments_index, args.chunk_size)
+        # Read the next chunk on a background thread while the current one is being generated
+        with ThreadPoolExecutor(max_workers=1) as reader:
+            next_chunk = reader.submit(next, chunks, None)
+            while True:
+                chunk = next_chunk.result()
+                if chunk is None:
+                    break
+                next_chunk = reader.submit(next, chunks, None)
+                results, skipped_candidates = process_chunk(
+                    chunk, args, api_key, cache, journal, already_completed, client, telemetry
+                )
+                writer.write(results)
+                skipped_total.extend(skipped_candidates)
+                print(f"{writer.rows_written} reports written ({time.monotonic() - started:.0f}s elapsed).", file=sys.stderr)
+    except (Exception, KeyboardInterrupt):
+        if journal is not None:
+            print(f"{len(journal.completed())} reports were completed and saved before the failure. "
+                  "Run the same command without --bypass-cache or --no-resume to finish the rest.", file=sys.stderr)
+        raise
+    finally:
+        writer.close()
+        comments_index.close()
+        if cache is not None:
+            cache.evict()
+            cache.close()
+
+    if skipped_total:
+        print(f"Skipped {len(skipped_total)} candidates due to missing comment data: {', '.join(map(str, skipped_total))}", file=sys.stderr)
+    print(f"Done: {writer.rows_written} reports written to {args.output}.", file=sys.stderr)
+    if telemetry is not None:
+        telemetry.finish()
+        for metric, value in telemetry.summary().items():
+            print(f"  {metric}: {value}", file=sys.stderr)
+        if args.metrics:
+            telemetry.records_frame().to_csv(args.metrics, index=False)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate Leadership Potential Reports without the Streamlit UI.")
+    parser.add_argument('--scores', required=True, help="Candidate scores file (.xlsx, .csv or .parquet).")
+    parser.add_argument('--comments', required=True, help="Assessor comments file (.xlsx, .csv or .parquet).")
+    parser.add_argument('--output', required=True, help="Output file (.csv, .xlsx or .parquet).")
+    parser.add_argument('--api-key', action='append', default=None,
+                        help="Gemini API key; repeat to spread requests over several keys (defaults to the comma-separated GEMINI_API_KEY environment variable).")
+    parser.add_argument('--fallback-model', action='append', default=[],
+                        help=f"Model to fail over to when every key is throttled or out of quota for {MODEL_NAME}; repeatable, in order.")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent requests (default: 4).")
+    parser.add_argument('--rpm', type=int, default=0, help="Requests-per-minute quota to pace requests under (default: 0, no limit).")
+    parser.add_argument('--tpm', type=int, default=0, help="Input tokens-per-minute quota to pace requests under (default: 0, no limit).")
+    parser.add_argument('--batch-size', type=int, default=1, help="Candidates packed per request (default: 1).")
+    parser.add_argument('--max-corrections', type=int, default=1, help="Corrective re-requests per candidate failing the Appendix rules (default: 1, 0 disables).")
+    parser.add_argument('--chunk-size', type=int, default=200, help="Candidates read and generated per chunk (default: 200).")
+    parser.add_argument('--metrics', default=None, help="Optional CSV path for the per-candidate run metrics.")
+    parser.add_argument('--draft-only', action='store_true', help="Draft reports offline with the rule engine; no API calls.")
+    parser.add_argument('--no-facts', action='store_true', help="Send the full level matrix instead of precomputed facts.")
+    parser.add_argument('--bypass-cache', action='store_true', help="Ignore cached responses and start the run over (fresh ones are still cached).")
+    parser.add_argument('--no-resume', action='store_true', help="Start over instead of resuming an earlier run on the same files.")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    run(parse_args())
@@ -0,0 +1,519 @@
+import email.utils
+import json
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from prompt_builder import estimate_tokens
+
+API_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+
+# Statuses worth retrying: timeouts, quota (429) and transient server errors. Anything else (400, 401, 403,
+# 404, ...) will not succeed on a retry and is returned as an error straight away.
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+# --- Quota-aware rate limiting ---
+class TokenBucket:
+    """Token bucket refilled continuously at capacity_per_minute / 60 per second."""
+
+    def __init__(self, capacity_per_minute):
+        self.capacity = float(capacity_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now, rate_factor):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60.0 * rate_factor)
+        self.updated = now
+
+    def wait_time(self, amount, rate_factor):
+        """Seconds until amount tokens are available (0 if they are available now)."""
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / (self.capacity / 60.0 * rate_factor)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter shared by all worker threads.
+
+    The limiter adapts to throttling: a 429 pauses every worker until its Retry-After has passed and cuts
+    the effective rate, which then recovers gradually with each successful call. A limit of 0/None means
+    unlimited, but the 429 pause still applies.
+    """
+
+    MIN_RATE_FACTOR = 0.1
+    THROTTLE_DECREASE = 0.7
+    SUCCESS_INCREASE = 0.05
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute or None
+        self.tokens_per_minute = tokens_per_minute or None
+        self._request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.rate_factor = 1.0
+        self.paused_until = 0.0
+        self.throttle_count = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, token_count):
+        """Blocks until one request of token_count tokens fits within the limits. Returns the seconds waited."""
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                buckets = [(b, n) for b, n in ((self._request_bucket, 1), (self._token_bucket, token_count)) if b]
+                for bucket, _ in buckets:
+                    bucket.refill(now, self.rate_factor)
+                delay = max([self.paused_until - now] + [b.wait_time(n, self.rate_factor) for b, n in buckets])
+                if delay <= 0:
+                    for bucket, amount in buckets:
+                        bucket.tokens -= min(amount, bucket.capacity)
+                    return now - started
+            time.sleep(min(delay, 1.0))
+
+    def headroom(self):
+        """Returns the share of capacity available right now (0 while paused, 1.0 when unlimited)."""
+        with self._lock:
+            now = time.monotonic()
+            if self.paused_until > now:
+                return 0.0
+            shares = [1.0]
+            for bucket in (self._request_bucket, self._token_bucket):
+                if bucket:
+                    bucket.refill(now, self.rate_factor)
+                    shares.append(bucket.tokens / bucket.capacity)
+            return min(shares)
+
+    def record_success(self):
+        with self._lock:
+            self.rate_factor = min(1.0, self.rate_factor + self.SUCCESS_INCREASE)
+
+    def record_throttle(self, retry_after):
+        """Pauses all callers for retry_after seconds and lowers the effective rate."""
+        with self._lock:
+            self.throttle_count += 1
+            self.rate_factor = max(self.MIN_RATE_FACTOR, self.rate_factor * self.THROTTLE_DECREASE)
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+
+# --- Circuit breaker ---
+class CircuitBreaker:
+    """Stops sending requests after failure_threshold consecutive failures.
+
+    While open, calls fail fast. After reset_timeout seconds one trial request is let through (half-open);
+    its success closes the breaker again, its failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at = None
+        # When the breaker last went from closed to open; opened_at moves on with every failed trial
+        self.open_since = None
+        self._trial_in_flight = False
+        self._trial_thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    @property
+    def ready(self):
+        """True if a call would be let through now: the breaker is closed or a half-open trial is due."""
+        with self._lock:
+            return self.opened_at is None or (
+                time.monotonic() - self.opened_at >= self.reset_timeout and not self._trial_in_flight
+            )
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._trial_thread = threading.get_ident()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.open_since = None
+            self._trial_in_flight = False
+            self._trial_thread = None
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            self._trial_thread = None
+            if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self.open_since = self.open_since or self.opened_at
+
+    def release_trial(self):
+        """Ends this thread's half-open trial if it got no verdict (e.g. a 429 or a rejected request), so the next
+        call can try again. The breaker stays open until a trial succeeds.
+        """
+        with self._lock:
+            if self._trial_thread == threading.get_ident():
+                self._trial_in_flight = False
+                self._trial_thread = None
+
+
+# --- Retry helpers ---
+def backoff_delay(attempt, base_delay=1.0, max_delay=60.0):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def retry_after_seconds(response):
+    """Returns the server-requested delay from a Retry-After header or a Gemini RetryInfo detail, if any."""
+    header = response.headers.get('Retry-After')
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            try:
+                parsed = email.utils.parsedate_to_datetime(header)
+            except (TypeError, ValueError):
+                # Malformed header (Python 3.10+ raises instead of returning None): fall through to RetryInfo
+                parsed = None
+            if parsed is not None:
+                return max(0.0, parsed.timestamp() - time.time())
+    try:
+        for detail in response.json().get('error', {}).get('details', []):
+            if str(detail.get('@type', '')).endswith('RetryInfo') and 'retryDelay' in detail:
+                return float(str(detail['retryDelay']).rstrip('s'))
+    except (ValueError, AttributeError):
+        pass
+    return None
+
+
+def is_daily_quota_exhausted(response):
+    """Returns True if a 429 response reports a per-day quota (QuotaFailure detail), which a short retry won't fix."""
+    try:
+        for detail in response.json().get('error', {}).get('details', []):
+            if str(detail.get('@type', '')).endswith('QuotaFailure'):
+                if any('PerDay' in str(violation.get('quotaId', '')) for violation in detail.get('violations', [])):
+                    return True
+    except (ValueError, AttributeError):
+        pass
+    return False
+
+
+def mask_key(api_key):
+    """Returns a short label for an API key that is safe to show and export (its last four characters)."""
+    return f"...{str(api_key)[-4:]}" if api_key else None
+
+
+def _error_message(response):
+    try:
+        return response.json().get('error', {}).get('message') or response.text[:300]
+    except ValueError:
+        return response.text[:300]
+
+
+def read_sse_stream(response, on_text=None):
+    """Consumes a streamGenerateContent (alt=sse) response chunk by chunk and merges it into one
+    generateContent-shaped result. on_text(text_so_far) is called as each piece of text arrives.
+    """
+    text = ''
+    last_chunk = {}
+    usage = {}
+    finish_reason = None
+    for line in response.iter_lines():
+        # Split on raw bytes and decode per line: the event stream is UTF-8 but usually declares no charset
+        line = line.decode('utf-8')
+        if not line.startswith('data:'):
+            continue
+        last_chunk = json.loads(line[len('data:'):])
+        usage = last_chunk.get('usageMetadata', usage)
+        for candidate in last_chunk.get('candidates', [])[:1]:
+            finish_reason = candidate.get('finishReason', finish_reason)
+            for part in candidate.get('content', {}).get('parts', []):
+                if part.get('text') and not part.get('thought'):
+                    text += part['text']
+                    if on_text is not None:
+                        on_text(text)
+    if not text:
+        return last_chunk
+    return {
+        'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}, 'finishReason': finish_reason}],
+        'usageMetadata': usage,
+    }
+
+
+def extract_text(result):
+    """Returns the text of a generateContent response, or an error string if it has none."""
+    if 'candidates' in result and result['candidates']:
+        content_part = result['candidates'][0].get('content', {}).get('parts', [{}])[0]
+        return content_part.get('text', "Error: Could not extract text from API response.")
+    # Include the invalid response for debugging (this may run on a worker thread, so no st.* calls here)
+    return f"Error: The API response was invalid: {json.dumps(result)[:500]}"
+
+
+# --- Shared client ---
+def make_session(pool_size=32):
+    """Returns a requests Session with a keep-alive connection pool of pool_size and no transport-level retries."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class GeminiClient:
+    """Shared Gemini API client: pooled keep-alive connections, RPM/TPM limiting, status-aware retries with
+    jittered backoff that honours Retry-After, and a circuit breaker. One instance is safe to share across threads.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_retries=5, timeout=120,
+                 pool_size=32, failure_threshold=5, reset_timeout=60.0, base_url=API_BASE_URL, session=None):
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.session = session or make_session(pool_size)
+
+    @property
+    def throttle_count(self):
+        return self.limiter.throttle_count
+
+    def generate(self, prompt, api_key, model_name, generation_config=None, metrics=None, on_text=None):
+        """Calls generateContent and returns the generated text, or an 'Error: ...' string.
+
+        If a metrics dict is given it is filled with attempts, retries, rate limiter wait, HTTP latency,
+        the final status code and the response's usageMetadata token counts.
+        With on_text, the streaming endpoint (streamGenerateContent) is used instead and on_text(text_so_far)
+        is called from this thread as chunks arrive; the time to the first chunk is recorded as first_text_seconds.
+        """
+        metrics = {} if metrics is None else metrics
+        metrics.update({'attempts': 0, 'retries': 0, 'rate_limit_wait': 0.0, 'http_seconds': 0.0, 'status': None,
+                        'model': model_name, 'api_key': mask_key(api_key)})
+        if not api_key:
+            return "Error: Gemini API key is missing. Please provide it in the sidebar."
+
+        stream = on_text is not None
+        url = f"{self.base_url}/{model_name}:{'streamGenerateContent?alt=sse' if stream else 'generateContent'}"
+        # The key goes in a header rather than the URL so it never appears in exception messages
+        headers = {'Content-Type': 'application/json', 'x-goog-api-key': api_key}
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        if generation_config:
+            payload["generationConfig"] = generation_config
+        token_count = estimate_tokens(prompt)
+
+        def record_text(text):
+            # started is the current attempt's start time
+            metrics.setdefault('first_text_seconds', time.perf_counter() - started)
+            on_text(text)
+
+        last_error = None
+        for attempt in range(self.max_retries):
+            if not self.breaker.allow():
+                return "Error: Gemini API requests are paused after repeated failures (circuit breaker open). Try again shortly."
+            try:
+                metrics['rate_limit_wait'] += self.limiter.acquire(token_count)
+                metrics['attempts'] += 1
+                metrics['retries'] = metrics['attempts'] - 1
+
+                started = time.perf_counter()
+                try:
+                    response = self.session.post(url, headers=headers, json=payload, timeout=self.timeout, stream=stream)
+                    if stream and response.status_code == 200:
+                        result = read_sse_stream(response, record_text)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                        requests.exceptions.ChunkedEncodingError) as e:
+                    # Includes streams cut off part-way; the retry starts the response over
+                    metrics['http_seconds'] += time.perf_counter() - started
+                    metrics.pop('first_text_seconds', None)
+                    self.breaker.record_failure()
+                    last_error = e
+                    if attempt + 1 < self.max_retries:
+                        time.sleep(backoff_delay(attempt))
+                    continue
+                except requests.exceptions.RequestException as e:
+                    return f"Error: An API request failed: {e}"
+                except ValueError as e:
+                    # The stream was only partly read: close it so the connection is not left out of the pool
+                    response.close()
+                    return f"Error: The API response stream was not valid JSON: {e}"
+                metrics['http_seconds'] += time.perf_counter() - started
+                metrics['status'] = response.status_code
+
+                if response.status_code == 200:
+                    self.breaker.record_success()
+                    self.limiter.record_success()
+                    if not stream:
+                        try:
+                            result = response.json()
+                        except ValueError as e:
+                            return f"Error: The API response was not valid JSON: {e}"
+                    usage = result.get('usageMetadata', {})
+                    metrics['prompt_tokens'] = usage.get('promptTokenCount', 0)
+                    metrics['output_tokens'] = usage.get('candidatesTokenCount', 0) + usage.get('thoughtsTokenCount', 0)
+                    metrics['cached_tokens'] = usage.get('cachedContentTokenCount', 0)
+                    return extract_text(result)
+
+                if response.status_code not in RETRYABLE_STATUSES:
+                    return f"Error: The API request was rejected ({response.status_code}): {_error_message(response)}"
+
+                last_error = f"HTTP {response.status_code}: {_error_message(response)}"
+                retry_after = retry_after_seconds(response)
+                if response.status_code == 429:
+                    metrics['daily_quota_exhausted'] = is_daily_quota_exhausted(response)
+                    # Quota throttling is not a service failure: slow everyone down instead of tripping the breaker
+                    self.limiter.record_throttle(retry_after if retry_after is not None else backoff_delay(attempt))
+                else:
+                    self.breaker.record_failure()
+                    if attempt + 1 < self.max_retries:
+                        time.sleep(retry_after + random.uniform(0, 1) if retry_after is not None else backoff_delay(attempt))
+            finally:
+                # Every exit path must end a half-open trial, or the breaker would stay shut for good
+                self.breaker.release_trial()
+
+        return f"Error: An API request failed after multiple retries: {last_error}"
+
+
+# --- Multi-key, multi-model dispatch ---
+# A key rejected with these statuses is taken out of the rotation; a 404 (unknown model) drops only that pair
+REJECTED_KEY_STATUSES = {401, 403}
+# A pair whose circuit breaker has stayed open this long is dropped, as long as another pair is left
+MAX_BREAKER_OPEN_SECONDS = 600.0
+
+
+class GeminiDispatcher:
+    """Spreads requests over a pool of API keys and an ordered list of models (e.g. pro, then flash as fallback).
+
+    Every key/model pair has its own GeminiClient, so RPM/TPM limits, 429 pauses and the circuit breaker apply
+    per pair, as Gemini quotas do. A request goes to the first model that has a pair ready to take it, on the
+    pair with the most remaining capacity (then the fewest requests in flight), and fails over to another pair
+    when that one is throttled, out of quota or failing. Rejected keys, pairs out of daily quota and pairs whose
+    breaker has been open for more than max_breaker_open_seconds are dropped (the last pair standing never is).
+    Has the same generate() interface as GeminiClient and is just as safe to share across threads.
+    """
+
+    def __init__(self, api_keys, models, requests_per_minute=None, tokens_per_minute=None, max_retries=5,
+                 pool_size=32, max_breaker_open_seconds=MAX_BREAKER_OPEN_SECONDS, session=None, **client_options):
+        self.api_keys = list(dict.fromkeys(key for key in api_keys if key))
+        self.models = list(dict.fromkeys(models))
+        self.max_retries = max_retries
+        self.max_breaker_open_seconds = max_breaker_open_seconds
+        # One connection pool for every pair: they all talk to the same host
+        session = session or make_session(pool_size)
+        self.clients = {
+            (key, model): GeminiClient(requests_per_minute, tokens_per_minute, max_retries=1, session=session, **client_options)
+            for model in self.models for key in self.api_keys
+        }
+        self.in_flight = dict.fromkeys(self.clients, 0)
+        self.dropped = set()
+        self._lock = threading.Lock()
+
+    @property
+    def throttle_count(self):
+        return sum(client.throttle_count for client in self.clients.values())
+
+    def _choose(self, tried):
+        """Returns the key/model pair for the next attempt, or None if every pair has been dropped.
+
+        Ready pairs (not paused, breaker closed or due a half-open trial) are ranked by model order, then pairs not
+        yet tried for this request, then remaining capacity and requests in flight. If none is ready, the pair that
+        becomes ready first is returned and its limiter or breaker does the waiting.
+        """
+        with self._lock:
+            live = [pair for pair in self.clients if pair not in self.dropped]
+            now = time.monotonic()
+            for pair in list(live):
+                open_since = self.clients[pair].breaker.open_since
+                if len(live) > 1 and open_since is not None and now - open_since > self.max_breaker_open_seconds:
+                    self.dropped.add(pair)
+                    live.remove(pair)
+            if not live:
+                return None
+            ranked = []
+            for pair in live:
+                client = self.clients[pair]
+                headroom = client.limiter.headroom()
+                if headroom > 0 and client.breaker.ready:
+                    ranked.append((self.models.index(pair[1]), pair in tried, -headroom, self.in_flight[pair], pair))
+            if ranked:
+                pair = min(ranked, key=lambda entry: entry[:4])[4]
+            else:
+                pair = min(live, key=lambda pair: (self._ready_at(pair), self.models.index(pair[1])))
+            self.in_flight[pair] += 1
+            return pair
+
+    def _ready_at(self, pair):
+        """Returns the monotonic time at which the pair's 429 pause and open breaker (if any) will both have ended."""
+        client = self.clients[pair]
+        opened_at = client.breaker.opened_at
+        trial_at = opened_at + client.breaker.reset_timeout if opened_at is not None else 0.0
+        return max(client.limiter.paused_until, trial_at)
+
+    def _drop(self, pairs):
+        with self._lock:
+            self.dropped.update(pairs)
+
+    def generate(self, prompt, api_key=None, model_name=None, generation_config=None, metrics=None, on_text=None):
+        """Sends the request to the best available key/model pair. api_key and model_name are ignored.
+
+        Returns the generated text or an 'Error: ...' string. metrics is filled like GeminiClient.generate,
+        summed over every attempt, with the model and masked key of the attempt that produced the result.
+        """
+        metrics = {} if metrics is None else metrics
+        metrics.update({'attempts': 0, 'retries': 0, 'rate_limit_wait': 0.0, 'http_seconds': 0.0, 'status': None,
+                        'model': None, 'api_key': None})
+        tried = set()
+        report_text = "Error: No Gemini API keys are configured."
+        for attempt in range(self.max_retries):
+            pair = self._choose(tried)
+            if pair is None:
+                return f"Error: Every API key was rejected or is out of quota for every model. Last error: {report_text}"
+            tried.add(pair)
+            attempt_metrics = {}
+            try:
+                report_text = self.clients[pair].generate(prompt, pair[0], pair[1], generation_config, attempt_metrics, on_text)
+            finally:
+                with self._lock:
+                    self.in_flight[pair] -= 1
+            for field in ('attempts', 'rate_limit_wait', 'http_seconds'):
+                metrics[field] += attempt_metrics.pop(field, 0)
+            attempt_metrics.pop('retries', None)
+            metrics.update(attempt_metrics)
+            metrics['retries'] = max(0, metrics['attempts'] - 1)
+            if not report_text.startswith("Error:"):
+                return report_text
+
+            status = attempt_metrics.get('status')
+            if status in REJECTED_KEY_STATUSES:
+                self._drop([p for p in self.clients if p[0] == pair[0]])
+            elif status == 404 or attempt_metrics.get('daily_quota_exhausted'):
+                self._drop([pair])
+            elif status is not None and status not in RETRYABLE_STATUSES:
+                # e.g. 400: the request itself is invalid, another key or model won't help
+                return report_text
+            elif status != 429:
+                # Server errors, timeouts and an open breaker: back off before the next attempt
+                time.sleep(backoff_delay(attempt))
+        return report_text
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    """Returns the process-wide client used when none is passed explicitly (no RPM/TPM limits)."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = GeminiClient()
+        return _default_client
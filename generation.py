@@ -0,0 +1,249 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from gemini_client import get_default_client
+from prompt_builder import (
+    BATCH_GENERATION_CONFIG,
+    build_batch_prompt,
+    build_corrective_prompt,
+    build_prompt,
+    estimate_tokens_saved,
+    parse_batch_response,
+)
+from report_validator import candidate_comments, validate_report
+from response_cache import is_error_response
+from rule_engine import draft_report, format_facts_for_prompt
+
+MODEL_NAME = "gemini-2.5-pro"
+
+# How often streamed partial text is handed to on_partial while requests are in flight
+PARTIAL_REFRESH_SECONDS = 0.25
+
+# --- Function to call the Gemini API through the shared client ---
+def call_gemini_api(prompt, api_key, generation_config=None, client=None, metrics=None, on_text=None):
+    """Calls the Gemini API and returns the generated text, or an 'Error: ...' string.
+
+    Requests go through a shared GeminiClient (pooled connections, RPM/TPM limits, status-aware retries and a
+    circuit breaker); the process-wide default client is used when none is given. A metrics dict, if given,
+    is filled with the call's retries, timings and token usage. With on_text, the response is streamed and
+    on_text(text_so_far) is called as chunks arrive.
+    """
+    return (client or get_default_client()).generate(prompt, api_key, MODEL_NAME, generation_config, metrics, on_text)
+
+def _timed_call(prompt, api_key, generation_config, client, submitted_at, on_text=None):
+    """Runs call_gemini_api on a worker thread and returns (text, submitted at, started at, call metrics)."""
+    started_at = time.perf_counter()
+    call_metrics = {}
+    report_text = call_gemini_api(prompt, api_key, generation_config, client, call_metrics, on_text)
+    return report_text, submitted_at, started_at, call_metrics
+
+# --- Function to index the uploaded data by candidate ---
+def prepare_candidates(scores_df, comments_df):
+    """Groups the scores and comments once into a name -> (scores, strength comments, development comments) lookup.
+
+    Returns the lookup (in scores file order) and the list of candidates skipped because their strength or
+    development comments are missing. As before, the first row per name and comment type is used.
+    """
+    candidate_list = pd.Index(scores_df['name'].unique())
+    first_scores = scores_df.drop_duplicates('name').set_index('name', drop=False)
+    strength_rows = comments_df[comments_df['comment_type'] == 'Strength'].drop_duplicates('name').set_index('name', drop=False)
+    dev_rows = comments_df[comments_df['comment_type'] == 'Development Area'].drop_duplicates('name').set_index('name', drop=False)
+
+    # --- Detect candidates with missing comments up front (vectorized) ---
+    has_comments = candidate_list.isin(strength_rows.index) & candidate_list.isin(dev_rows.index)
+    skipped_candidates = candidate_list[~has_comments].tolist()
+    ready_names = candidate_list[has_comments]
+
+    scores_by_name = first_scores.loc[ready_names].to_dict('index')
+    strength_by_name = strength_rows.loc[ready_names].to_dict('index')
+    dev_by_name = dev_rows.loc[ready_names].to_dict('index')
+    prepared_candidates = {
+        name: (scores_by_name[name], strength_by_name[name], dev_by_name[name]) for name in ready_names
+    }
+    return prepared_candidates, skipped_candidates
+
+# --- Function to generate reports concurrently ---
+class GenerationOptions:
+    """Settings, collaborators and callbacks for one generate_reports run; all optional.
+
+    Callbacks run on the calling thread. Setting cancel_event stops new requests; in-flight ones still finish.
+    """
+
+    def __init__(self, max_workers=1, batch_size=1, max_corrections=0, cache=None, bypass_cache=False, journal=None,
+                 client=None, telemetry=None, on_complete=None, on_partial=None, cancel_event=None):
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.max_corrections = max_corrections
+        self.cache = cache
+        self.bypass_cache = bypass_cache
+        self.journal = journal
+        self.client = client
+        self.telemetry = telemetry
+        self.on_complete = on_complete
+        self.on_partial = on_partial
+        self.cancel_event = cancel_event
+
+def generate_reports(jobs, api_key, options=None):
+    """Generates a summary for each (name, prompt, batch_entry) job on a thread pool and returns the results in job order.
+
+    Results are {'name', 'summary', 'model', 'api_key'} dicts. A failing candidate gets an 'Error: ...' summary
+    without stopping the rest; candidates left unfinished by a cancellation are omitted. batch_entry is the
+    (candidate_data, strength_comments, dev_comments, facts_text) tuple used for batching and validation.
+    """
+    options = options or GenerationOptions()
+    cache, journal, client, telemetry = options.cache, options.journal, options.client, options.telemetry
+    on_complete, on_partial, cancel_event = options.on_complete, options.on_partial, options.cancel_event
+    max_corrections = options.max_corrections
+    results = [None] * len(jobs)
+    finished_count = 0
+    corrections = [0] * len(jobs)
+    produced_by = [(None, None)] * len(jobs)
+    # Latest streamed text per candidate, written by worker threads and drained on the calling thread
+    partial_texts = {}
+    partial_lock = threading.Lock()
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    def stream_to(candidate_name):
+        def on_text(text):
+            with partial_lock:
+                partial_texts[candidate_name] = text
+        return on_text
+
+    def flush_partials():
+        with partial_lock:
+            updates = list(partial_texts.items())
+            partial_texts.clear()
+        for candidate_name, text in updates:
+            on_partial(candidate_name, text)
+
+    def finish(idx, report_text, from_cache=False):
+        nonlocal finished_count
+        candidate_name, prompt = jobs[idx][0], jobs[idx][1]
+        violations = []
+        if max_corrections and not is_error_response(report_text):
+            candidate_data, strength_comments, dev_comments, _ = jobs[idx][2]
+            violations = validate_report(
+                report_text, candidate_data.get('gender'), candidate_comments(strength_comments, dev_comments), candidate_name
+            )
+            if telemetry is not None:
+                telemetry.record(candidate_name, rule_violations=len(violations))
+            if violations and corrections[idx] < max_corrections and not cancelled():
+                # Re-request only this candidate, telling the model what to fix
+                corrections[idx] += 1
+                if telemetry is not None:
+                    telemetry.record(candidate_name, corrections=corrections[idx])
+                submit([idx], build_corrective_prompt(prompt, report_text, violations))
+                return
+        model_name, api_key_label = produced_by[idx]
+        # Only compliant answers from the primary model are cached, never a fallback model's
+        if cache is not None and not from_cache and not violations and model_name in (None, MODEL_NAME):
+            cache.put(MODEL_NAME, prompt, report_text)
+        if journal is not None:
+            journal.append(candidate_name, report_text)
+        if telemetry is not None:
+            telemetry.record(candidate_name, error=is_error_response(report_text))
+        results[idx] = {'name': candidate_name, 'summary': report_text, 'model': model_name, 'api_key': api_key_label}
+        finished_count += 1
+        if on_complete is not None:
+            on_complete(candidate_name, finished_count, report_text)
+
+    with ThreadPoolExecutor(max_workers=max(1, options.max_workers)) as executor:
+        # Each future maps to the job indices it answers; more than one index means a packed (batched) request
+        pending = {}
+
+        def submit(indices, prompt, generation_config=None):
+            if cancelled():
+                return
+            # Batched (JSON) responses are not streamed: partial JSON is of no use to show
+            on_text = stream_to(jobs[indices[0]][0]) if on_partial is not None and len(indices) == 1 else None
+            future = executor.submit(_timed_call, prompt, api_key, generation_config, client, time.perf_counter(), on_text)
+            pending[future] = indices
+
+        # --- Answer unchanged prompts from the cache ---
+        uncached_indices = []
+        for idx, job in enumerate(jobs):
+            cached_text = None if cache is None or options.bypass_cache else cache.get(MODEL_NAME, job[1])
+            if cached_text is None:
+                uncached_indices.append(idx)
+                continue
+            if telemetry is not None:
+                telemetry.record(job[0], source='cache')
+            finish(idx, cached_text, from_cache=True)
+
+        batch_size = max(1, options.batch_size)
+        for start in range(0, len(uncached_indices), batch_size):
+            indices = uncached_indices[start:start + batch_size]
+            if len(indices) > 1:
+                submit(indices, build_batch_prompt([jobs[idx][2] for idx in indices]), BATCH_GENERATION_CONFIG)
+            else:
+                submit(indices, jobs[indices[0]][1])
+
+        while pending:
+            if on_partial is None and cancel_event is None:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            else:
+                done, _ = wait(pending, timeout=PARTIAL_REFRESH_SECONDS, return_when=FIRST_COMPLETED)
+                if on_partial is not None:
+                    flush_partials()
+            if cancelled():
+                for future in list(pending):
+                    if future not in done and future.cancel():
+                        del pending[future]
+            for future in done:
+                indices = pending.pop(future)
+                try:
+                    response_text, submitted_at, started_at, call_metrics = future.result()
+                    for idx in indices:
+                        produced_by[idx] = (call_metrics.get('model'), call_metrics.get('api_key'))
+                    if telemetry is not None:
+                        telemetry.record_call([jobs[idx][0] for idx in indices], submitted_at, started_at, call_metrics)
+                except Exception as e:
+                    response_text = f"Error: Report generation failed unexpectedly: {e}"
+
+                if len(indices) == 1:
+                    finish(indices[0], response_text)
+                    continue
+
+                reports = parse_batch_response(response_text, [jobs[idx][0] for idx in indices])
+                for idx in indices:
+                    report_text = reports.get(str(jobs[idx][0]))
+                    if report_text is not None:
+                        finish(idx, report_text)
+                    else:
+                        # Missing or malformed in the batched response: retry this candidate on its own
+                        submit([idx], jobs[idx][1])
+    return [result for result in results if result is not None]
+
+# --- Functions shared by the Streamlit app and the batch CLI ---
+def build_jobs(prepared_candidates, report_facts, use_rule_facts=True, exclude=(), telemetry=None):
+    """Builds the generate_reports jobs for the prepared candidates, skipping names in exclude.
+
+    Returns the jobs and the estimated input tokens saved by the level-specific prompt sections.
+    """
+    jobs = []
+    tokens_saved = 0
+    for candidate_name, (candidate_data, strength_comments, dev_comments) in prepared_candidates.items():
+        if str(candidate_name) in exclude:
+            continue
+        started = time.perf_counter()
+        # --- Build the level-specific prompt (shared static prefix + candidate data) ---
+        facts_text = format_facts_for_prompt(report_facts.loc[str(candidate_name)]) if use_rule_facts else None
+        final_prompt = build_prompt(candidate_data, strength_comments, dev_comments, facts_text)
+        tokens_saved += estimate_tokens_saved(candidate_data.get('level'), facts_text)
+        jobs.append((candidate_name, final_prompt, (candidate_data, strength_comments, dev_comments, facts_text)))
+        if telemetry is not None:
+            telemetry.record(candidate_name, prompt_build_ms=round((time.perf_counter() - started) * 1000, 3))
+    return jobs, tokens_saved
+
+
+def draft_reports(prepared_candidates, report_facts):
+    """Drafts every prepared candidate's report offline with the rule engine (no API calls)."""
+    return [
+        {'name': candidate_name, 'summary': draft_report(report_facts.loc[str(candidate_name)], strength_comments, dev_comments)}
+        for candidate_name, (_, strength_comments, dev_comments) in prepared_candidates.items()
+    ]
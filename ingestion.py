@@ -0,0 +1,216 @@
+import csv
+import importlib.util
+import io
+import os
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from prompt_builder import LEVEL_MATRICES
+from rule_engine import COMPETENCIES, PRONOUNS
+
+SUPPORTED_EXTENSIONS = ('.xlsx', '.csv', '.parquet')
+# python-calamine (Rust) parses .xlsx several times faster than openpyxl; openpyxl is the fallback
+XLSX_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') else 'openpyxl'
+
+SCORE_COLUMNS = ['Overall Leadership'] + COMPETENCIES
+SCORES_COLUMNS = ['name', 'gender', 'level'] + SCORE_COLUMNS
+COMMENTS_COLUMNS = ['name', 'comment_type'] + COMPETENCIES
+COMMENT_TYPES = ['Strength', 'Development Area']
+MIN_SCORE = 1.0
+MAX_SCORE = 5.0
+PROBLEM_COLUMNS = ['file', 'row', 'name', 'column', 'value', 'problem', 'severity']
+
+
+# --- Readers ---
+def _extension(file_name):
+    extension = os.path.splitext(str(file_name))[1].lower()
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise ValueError(f"Unsupported file type '{extension}' for {file_name}. Use .xlsx, .csv or .parquet.")
+    return extension
+
+
+def read_table(file_bytes, file_name):
+    """Parses an uploaded .xlsx, .csv or .parquet file (chosen by its extension) into a DataFrame."""
+    extension = _extension(file_name)
+    if extension == '.csv':
+        return pd.read_csv(io.BytesIO(file_bytes), encoding='utf-8-sig')
+    if extension == '.parquet':
+        try:
+            return pd.read_parquet(io.BytesIO(file_bytes))
+        except ImportError:
+            raise ValueError("Reading .parquet files requires pyarrow (pip install pyarrow).")
+    return pd.read_excel(io.BytesIO(file_bytes), engine=XLSX_ENGINE)
+
+
+def iter_rows(path, parquet_batch_size=10000):
+    """Yields each data row of an .xlsx (read-only mode), .csv or .parquet file as a dict keyed by column name.
+
+    Rows are streamed, so memory stays flat however large the file is.
+    """
+    extension = _extension(path)
+    if extension == '.csv':
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+        return
+
+    if extension == '.parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Reading .parquet files requires pyarrow (pip install pyarrow).")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=parquet_batch_size):
+            yield from batch.to_pylist()
+        return
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell) if cell is not None else '' for cell in next(rows, [])]
+        for values in rows:
+            if all(value is None for value in values):
+                continue
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+# --- Vectorized schema validation ---
+def _problems(df, mask, column, value, problem, severity='error', row_offset=0):
+    """Returns one problem row per True entry of mask. value and problem may be scalars or aligned Series."""
+    rows = df.index[mask]
+    return pd.DataFrame({
+        # Spreadsheet row numbers: the header is row 1
+        'row': rows + 2 + row_offset,
+        'name': df.loc[rows, 'name'] if 'name' in df else None,
+        'column': column,
+        'value': value[mask] if isinstance(value, pd.Series) else value,
+        'problem': problem[mask] if isinstance(problem, pd.Series) else problem,
+        'severity': severity,
+    })
+
+
+def _missing_columns(df, required_columns):
+    return pd.DataFrame({
+        'row': None, 'name': None, 'column': [c for c in required_columns if c not in df.columns], 'value': None,
+        'problem': "required column is missing", 'severity': 'error',
+    })
+
+
+def _blank(series):
+    return series.isna() | (series.astype(str).str.strip() == '')
+
+
+def validate_scores(scores_df, row_offset=0, seen_names=None):
+    """Checks a scores frame and returns every problem found as a DataFrame (PROBLEM_COLUMNS without 'file').
+
+    Checks the required columns, blank names, duplicate names, non-numeric, missing or out-of-range
+    (1.0-5.0) scores, unknown levels (errors) and unrecognised genders (warnings, pronouns fall back to
+    they/their). row_offset and seen_names (updated in place) let a file be validated in chunks.
+    """
+    df = scores_df.reset_index(drop=True)
+    problems = [_missing_columns(df, SCORES_COLUMNS)]
+
+    if 'name' in df:
+        names = df['name'].astype(str)
+        problems.append(_problems(df, _blank(df['name']), 'name', None, "name is blank", row_offset=row_offset))
+        duplicated = names.duplicated() & ~_blank(df['name'])
+        if seen_names is not None:
+            duplicated |= names.isin(seen_names)
+            seen_names.update(names)
+        problems.append(_problems(
+            df, duplicated, 'name', names, "duplicate name (also on an earlier row)", row_offset=row_offset
+        ))
+
+    present_scores = [column for column in SCORE_COLUMNS if column in df]
+    if present_scores:
+        raw = df[present_scores].melt(var_name='column', value_name='value', ignore_index=False)
+        numeric = pd.to_numeric(raw['value'], errors='coerce')
+        long = raw.assign(name=df['name'] if 'name' in df else None)
+        for mask, problem in [
+            (raw['value'].isna(), "score is missing"),
+            (raw['value'].notna() & numeric.isna(), "score is not a number"),
+            (numeric.notna() & ((numeric < MIN_SCORE) | (numeric > MAX_SCORE)), f"score is outside {MIN_SCORE}-{MAX_SCORE}"),
+        ]:
+            rows = long[mask]
+            problems.append(pd.DataFrame({
+                'row': rows.index + 2 + row_offset, 'name': rows['name'], 'column': rows['column'],
+                'value': rows['value'], 'problem': problem, 'severity': 'error',
+            }))
+
+    if 'level' in df:
+        levels = df['level'].astype(str).str.strip().str.upper()
+        problems.append(_problems(
+            df, ~levels.isin(list(LEVEL_MATRICES)), 'level', df['level'],
+            f"unknown level (expected {', '.join(level.title() for level in LEVEL_MATRICES)})", row_offset=row_offset
+        ))
+
+    if 'gender' in df:
+        genders = df['gender'].astype(str).str.strip().str.lower()
+        problems.append(_problems(
+            df, ~genders.isin(list(PRONOUNS)), 'gender', df['gender'],
+            "unrecognised gender, pronouns default to they/their", severity='warning', row_offset=row_offset
+        ))
+    return _sorted(problems)
+
+
+def validate_comments(comments_df, row_offset=0, seen_keys=None):
+    """Checks a comments frame and returns every problem found as a DataFrame (PROBLEM_COLUMNS without 'file').
+
+    Missing columns and blank names are errors. Unknown comment types, blank comments and repeated
+    name/comment type rows (only the first is used) are warnings. seen_keys works like validate_scores'
+    seen_names.
+    """
+    df = comments_df.reset_index(drop=True)
+    problems = [_missing_columns(df, COMMENTS_COLUMNS)]
+
+    if 'name' in df:
+        problems.append(_problems(df, _blank(df['name']), 'name', None, "name is blank", row_offset=row_offset))
+
+    if 'comment_type' in df:
+        problems.append(_problems(
+            df, ~df['comment_type'].isin(COMMENT_TYPES), 'comment_type', df['comment_type'],
+            f"unknown comment type, row is ignored (expected {' or '.join(COMMENT_TYPES)})",
+            severity='warning', row_offset=row_offset
+        ))
+        if 'name' in df:
+            keys = df['name'].astype(str) + '\x00' + df['comment_type'].astype(str)
+            duplicated = keys.duplicated()
+            if seen_keys is not None:
+                duplicated |= keys.isin(seen_keys)
+                seen_keys.update(keys)
+            problems.append(_problems(
+                df, duplicated, 'comment_type', df['comment_type'],
+                "repeated comment type for this name, only the first row is used", severity='warning', row_offset=row_offset
+            ))
+
+    present_comments = [column for column in COMPETENCIES if column in df]
+    if present_comments:
+        blank = df[present_comments].apply(_blank)
+        long = blank.melt(var_name='column', value_name='blank', ignore_index=False)
+        rows = long[long['blank']]
+        problems.append(pd.DataFrame({
+            'row': rows.index + 2 + row_offset, 'name': df.loc[rows.index, 'name'] if 'name' in df else None,
+            'column': rows['column'], 'value': None, 'problem': "comment is blank", 'severity': 'warning',
+        }))
+    return _sorted(problems)
+
+
+def _sorted(problems):
+    problems = [frame for frame in problems if not frame.empty]
+    if not problems:
+        return pd.DataFrame(columns=PROBLEM_COLUMNS[1:])
+    return pd.concat(problems, ignore_index=True).sort_values('row', na_position='first', kind='stable').reset_index(drop=True)
+
+
+def validate_uploads(scores_df, comments_df, scores_file='scores', comments_file='comments'):
+    """Validates both files and returns all their problems in one DataFrame with PROBLEM_COLUMNS."""
+    return pd.concat([
+        validate_scores(scores_df).assign(file=scores_file),
+        validate_comments(comments_df).assign(file=comments_file),
+    ], ignore_index=True).reindex(columns=PROBLEM_COLUMNS)
+
+
+def has_errors(problems):
+    """Returns True if any problem is an error (warnings do not block generation)."""
+    return bool((problems['severity'] == 'error').any())
@@ -0,0 +1,134 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_RUNNING_JOBS = 2
+DEFAULT_MAX_FINISHED_JOBS = 20
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+
+class Job:
+    """One background job. The worker writes its progress fields; the UI only reads them.
+
+    total/done count candidates, message is the latest progress line, partial is the latest streamed
+    (name, text), rows are the summaries finished so far, and messages are (kind, text) notices for the
+    UI, where kind is a Streamlit call such as 'info', 'warning' or 'caption'. result is whatever the job
+    function returned.
+    """
+
+    def __init__(self, job_id, label, key=None):
+        self.job_id = job_id
+        self.label = label
+        self.key = key
+        self.status = QUEUED
+        self.total = 0
+        self.done = 0
+        self.message = ""
+        self.partial = None
+        self.rows = []
+        self.messages = []
+        self.telemetry = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self._future = None
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    @property
+    def cancel_requested(self):
+        return self.cancel_event.is_set()
+
+    def notify(self, kind, text):
+        """Adds a notice for the UI, e.g. notify('warning', "...")."""
+        self.messages.append((kind, text))
+
+
+class JobManager:
+    """Runs jobs on a small pool of worker threads, independent of any one Streamlit session or script run.
+
+    submit() returns a job ID straight away; at most max_running_jobs jobs run at once and the rest wait
+    in submission order. Of the finished jobs, only the max_finished_jobs most recently submitted are kept
+    in memory.
+    """
+
+    def __init__(self, max_running_jobs=DEFAULT_MAX_RUNNING_JOBS, max_finished_jobs=DEFAULT_MAX_FINISHED_JOBS):
+        self.max_running_jobs = max_running_jobs
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_running_jobs, thread_name_prefix="report-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, label, fn, *args, key=None, **kwargs):
+        """Queues fn(job, *args, **kwargs) and returns the job ID.
+
+        If an unfinished job was submitted with the same key (e.g. the same files and settings from another
+        session or a double click), its ID is returned instead of starting the work twice.
+        """
+        with self._lock:
+            if key is not None:
+                for job in self._jobs.values():
+                    if job.key == key and not job.finished:
+                        return job.job_id
+            job = Job(uuid.uuid4().hex[:12], label, key)
+            self._jobs[job.job_id] = job
+            job._future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.job_id
+
+    def _run(self, job, fn, args, kwargs):
+        with self._lock:
+            if job.cancel_requested:
+                self._finish(job, CANCELLED)
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            status = CANCELLED if job.cancel_requested else COMPLETED
+        except Exception as e:
+            job.error = str(e)
+            status = FAILED
+        with self._lock:
+            self._finish(job, status)
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = time.time()
+        # Forget the oldest finished jobs beyond the retention limit
+        finished = [other for other in self._jobs.values() if other.finished]
+        for other in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[other.job_id]
+
+    def get(self, job_id):
+        """Returns the job with this ID, or None if it is unknown or no longer kept."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job_id):
+        """Returns how many queued jobs are ahead of this one (0 if it is next, None if it is not queued)."""
+        with self._lock:
+            queued = [job.job_id for job in self._jobs.values() if job.status == QUEUED]
+        return queued.index(job_id) if job_id in queued else None
+
+    def cancel(self, job_id):
+        """Cancels a job. A queued job never starts; a running one stops sending requests and keeps what it finished."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.cancel_event.set()
+            if job.status == QUEUED and job._future.cancel():
+                self._finish(job, CANCELLED)
+        return True
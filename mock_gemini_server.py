@@ -0,0 +1,206 @@
+"""Local stand-in for the Gemini generateContent endpoint, for offline benchmarks.
+
+Latency is drawn from a lognormal distribution around a median, a share of requests can be answered
+with 429 (with Retry-After) or 5xx errors, and usageMetadata token counts are reported like the real API.
+JSON-mode (batched) requests are answered with one structured report per candidate in the prompt.
+streamGenerateContent?alt=sse requests get the same response as server-sent events, split into a few chunks
+spread over the latency.
+
+Run standalone with:
+    python mock_gemini_server.py --port 8765 --latency-ms 800 --error-rate-429 0.02
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOCK_SUMMARY = (
+    "{name} demonstrates above average potential for growth and success in a more complex role. "
+    "She approaches work with a focus on the bigger picture and builds relationships with ease. "
+    "Her primary development area is managing change with greater decisiveness.\n\n"
+    "**Strengths:**\n\n"
+    "* Demonstrates a solid understanding of both short-term and long-term strategic approaches to projects.\n"
+    "* Demonstrates the ability to support the team through valuable contributions.\n\n"
+    "**Development Areas:**\n\n"
+    "* Would benefit from following up on actions to ensure change efforts are successful.\n"
+    "* Could focus on allocating resources to address varying priorities within the workload."
+)
+
+
+class MockGeminiConfig:
+    """Behaviour of the mock server. Rates are probabilities per request."""
+
+    def __init__(self, latency_ms=800.0, latency_sigma=0.5, error_rate_429=0.0, error_rate_5xx=0.0,
+                 retry_after=1.0, output_tokens=250, seed=None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate_429 = error_rate_429
+        self.error_rate_5xx = error_rate_5xx
+        self.retry_after = retry_after
+        self.output_tokens = output_tokens
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def draw(self):
+        """Returns (latency in seconds, status code) for one request."""
+        with self.lock:
+            latency = self.random.lognormvariate(0, self.latency_sigma) * self.latency_ms / 1000.0 if self.latency_ms else 0.0
+            roll = self.random.random()
+        if roll < self.error_rate_429:
+            return latency * 0.1, 429
+        if roll < self.error_rate_429 + self.error_rate_5xx:
+            return latency, 503
+        return latency, 200
+
+
+def _candidate_names(prompt):
+    # Candidate data blocks use "First Name: X" on its own line; the golden examples put it inline with other fields
+    return re.findall(r'^First Name: ([^,\n]+)$', prompt, flags=re.MULTILINE)
+
+
+def build_response(payload, config):
+    """Builds a generateContent response body for a request payload."""
+    prompt = payload['contents'][0]['parts'][0]['text']
+    names = _candidate_names(prompt) or ['Candidate']
+    generation_config = payload.get('generationConfig') or {}
+    if generation_config.get('responseMimeType') == 'application/json':
+        text = json.dumps([
+            {
+                'name': name,
+                'summary': MOCK_SUMMARY.split('\n\n')[0].format(name=name),
+                'strengths': ['Demonstrates strategic awareness.', 'Supports team development.'],
+                'development_areas': ['Would benefit from following up on change.', 'Could focus on prioritization.'],
+            }
+            for name in names
+        ])
+        output_tokens = config.output_tokens * len(names)
+    else:
+        text = MOCK_SUMMARY.format(name=names[-1])
+        output_tokens = config.output_tokens
+    prompt_tokens = len(prompt) // 4
+    return {
+        'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}, 'finishReason': 'STOP'}],
+        'usageMetadata': {
+            'promptTokenCount': prompt_tokens,
+            'candidatesTokenCount': output_tokens,
+            'totalTokenCount': prompt_tokens + output_tokens,
+        },
+    }
+
+
+def stream_chunks(response, chunk_count=4):
+    """Splits a generateContent response body into streamGenerateContent chunks; usage is sent with the last one."""
+    candidate = response['candidates'][0]
+    text = candidate['content']['parts'][0]['text']
+    size = max(1, -(-len(text) // chunk_count))
+    pieces = [text[i:i + size] for i in range(0, len(text), size)] or ['']
+    chunks = [{'candidates': [{'content': {'parts': [{'text': piece}], 'role': 'model'}}]} for piece in pieces]
+    chunks[-1]['candidates'][0]['finishReason'] = candidate['finishReason']
+    chunks[-1]['usageMetadata'] = response['usageMetadata']
+    return chunks
+
+
+def make_handler(config):
+    class MockGeminiHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, like the real endpoint
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, body, headers=None):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, body, latency):
+            # The first chunk arrives after a share of the latency, the rest are spread over the remainder
+            chunks = stream_chunks(body)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            time.sleep(latency * 0.3)
+            for chunk in chunks:
+                data = f"data: {json.dumps(chunk)}\r\n\r\n".encode('utf-8')
+                self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+                self.wfile.flush()
+                time.sleep(latency * 0.7 / len(chunks))
+            self.wfile.write(b"0\r\n\r\n")
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            latency, status = config.draw()
+            if status == 200 and ':streamGenerateContent' in self.path:
+                self._send_stream(build_response(payload, config), latency)
+                return
+            time.sleep(latency)
+            if status == 429:
+                self._send_json(429, {'error': {'code': 429, 'message': 'Resource has been exhausted (mock).'}},
+                                {'Retry-After': str(config.retry_after)})
+            elif status != 200:
+                self._send_json(status, {'error': {'code': status, 'message': 'The service is unavailable (mock).'}})
+            else:
+                self._send_json(200, build_response(payload, config))
+
+    return MockGeminiHandler
+
+
+class MockGeminiServer:
+    """Runs the mock server on a background thread. Use as a context manager; base_url points a GeminiClient at it."""
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        self.config = config or MockGeminiConfig()
+        self._server = ThreadingHTTPServer((host, port), make_handler(self.config))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1beta/models"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run a local mock Gemini generateContent server.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=800.0, help="Median response latency.")
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help="Lognormal spread of the latency.")
+    parser.add_argument('--error-rate-429', type=float, default=0.0)
+    parser.add_argument('--error-rate-5xx', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--output-tokens', type=int, default=250)
+    args = parser.parse_args()
+    server = MockGeminiServer(MockGeminiConfig(
+        args.latency_ms, args.latency_sigma, args.error_rate_429, args.error_rate_5xx, args.retry_after, args.output_tokens
+    ), port=args.port)
+    print(f"Mock Gemini server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,416 @@
+import json
+import string
+
+# --- Static prompt content (shared, byte-identical prefix for every request) ---
+# The golden examples and the appendix rules come first and never change between candidates, so every request
+# starts with the same prefix. This keeps it eligible for Gemini's prefix (context) caching.
+
+PROMPT_INTRO_AND_EXAMPLES = """You are an expert talent management consultant. Your task is to generate a concise and insightful leadership potential summary based on a candidate's assessment data. The output must be professional, behavioral, and strictly adhere to the format and rules outlined in the Appendix.
+
+First, learn from these high-quality examples (golden standards):
+
+EXAMPLE 1
+
+INPUT DATA:
+
+First Name: Ayesha, Gender: Female, Level: Guide
+
+Scores: Overall_Leadership: 2.97, Drives_Results: 3.0, Leads_People: 3.2, Manages_Stakeholders: 2.4, Thinks_Strategically: 3.4, Solves_Challenges: 3.9, Steers_Change: 2.9
+
+Strength Comment (Solves_Challenges): The candidate demonstrates strong ability to identify issues proactively and develop effective, logical solutions.
+
+Strength Comment (Thinks_Strategically): The candidate demonstrates a solid understanding of both short-term and long-term strategic approaches to projects.
+
+Development Comment (Manages_Stakeholders): The candidate would benefit from ensuring that the mutual objectives of relevant stakeholders are aligned and supported, to secure buy-in and sustain long-lasting relationships.
+
+Development Comment (Steers_Change): The candidate would benefit from proactively seeking to understand the underlying reasons for change, to better sustain team motivation and engagement throughout the change process.
+
+CORRECT OUTPUT:
+Ayesha demonstrates average potential for growth and success in a more complex role. A confident and resilient problem-solver, she navigates ambiguity well and shows an awareness of the bigger picture. While she is adaptable to change and supports others' development, her drive to achieve goals can be inconsistent, and she may need support to remain decisive during uncertainty. Her primary development area is in stakeholder engagement, where she would benefit from building stronger, more collaborative relationships.
+
+**Strengths:**
+
+*   Demonstrates strong ability to identify issues proactively and develop effective, logical solutions.
+*   Demonstrates a solid understanding of both short-term and long-term strategic approaches to projects.
+
+**Development Areas:**
+
+* Could benefit from ensuring that the mutual objectives of relevant stakeholders are aligned and supported, to secure buy-in and sustain long-lasting relationships.
+
+* Would benefit from proactively seeking to understand the underlying reasons for change to better sustain team motivation.
+
+EXAMPLE 2
+
+INPUT DATA:
+
+First Name: Badreyah, Gender: Female, Level: Apply
+
+Scores: Overall_Leadership: 3.66, Drives_Results: 3.9, Leads_People: 4.2, Manages_Stakeholders: 4.2, Thinks_Strategically: 3.9, Solves_Challenges: 3.9, Steers_Change: 4.3
+
+Strength Comment (Steers_Change): The candidate demonstrated strong comfort with changing environments and is supportive of adopting change initiatives.
+
+Strength Comment (Leads_People): The candidate demonstrates high effectiveness in collaborating with the team to develop solutions and achieve shared goals.
+
+Development Comment (Thinks_Strategically): Minimal development could be orientated towards improving task prioritization and effectively allocating workload to focus on strategically important activities.
+
+Development Comment (Manages_Stakeholders): Minor development could be focused on developing strategies to maintain key relationships over the long term that support sustained business outcomes.
+
+CORRECT OUTPUT:
+Badreyah demonstrates high potential for growth and success in a more complex role. She excels in changing and complex environments, showing great adaptability and decisiveness. A natural leader, she inspires others and builds strong, trust-based relationships while focusing on team development. Badreyah consistently demonstrates high motivation to achieve results, approaches her work with a strategic focus on the bigger picture, and solves challenges with confidence. Her development can focus on scaling these impressive strengths for even greater complexity.
+
+**Strengths:**
+
+* Demonstrated strong comfort with changing environments and is supportive of adopting change initiatives.
+
+* Demonstrates a high level of confidence in building relationships and understanding the needs of others.
+
+Development Areas:
+
+* Development could be orientated towards improving task prioritization and effectively allocating workload to focus on strategically important activities.
+
+* Could focus on developing strategies to maintain key relationships over the long term that support sustained business outcomes."""
+
+APPENDIX_RULES = """APPENDIX: RULES AND MATRICES
+1. Output Structure
+Your final output must contain two parts:
+
+Summary Paragraph: A single paragraph.
+
+Bulleted Points: Two strengths and two development areas, each as a single-sentence bullet point.
+
+Word count: the total word count of summary paragraph and bulleted points should strictly be less than 150 words, there should no deviation from this rule.
+
+As it has markdown formatting for strengths and development actions and the bullet points in them follow that as well. 
+
+2. Generation Process and Rules
+Follow this sequential process precisely.
+
+Step 1: The Opening Sentence
+Begin the summary paragraph with the sentence that corresponds exactly to the candidate's Overall_Leadership score, using the "Overall Leadership Potential Matrix" below. Use the candidate's first name.
+
+Step 2: The Summary Paragraph Narrative
+After the opening sentence, construct a narrative paragraph by performing the following:
+
+Identify the candidate's Level (Apply, Guide, or Shape) to select the correct interpretation matrix.
+
+Identify the 2-3 highest-scoring and 2-3 lowest-scoring of the six core competencies.
+
+Weave a narrative that describes the candidate's profile. Start with the themes from the highest-scoring competencies, followed by the lower-scoring areas to provide a balanced view.
+
+For each competency described, use the exact wording from the corresponding interpretation matrix. Do not name the competencies.
+
+Crucially, conclude the paragraph by explicitly identifying the primary development area(s). For most profiles, use phrases like 'Her primary development area is...' or 'His development can focus on...'. For high-performing candidates with all high scores, frame this positively, such as 'Her development can focus on scaling these impressive strengths for even greater complexity.'
+
+Ensure the paragraph flows naturally. The entire paragraph must be approximately 150 words.
+
+Step 3: Bullet Point Selection
+
+Strengths: Identify the two highest-scoring of the six core competencies. If there is a tie, select the competency with the most specific and behavioral strength comment from the assessor notes. Scores of 3.5 or above are always considered strengths.
+
+Development Areas: Identify the two lowest-scoring of the six core competencies. Scores of 2.49 or below are always considered development areas. If all scores are high (e.g., above 3.5), select the two competencies with the relatively lowest scores. If assessor comments are minimal for the lowest score, you may select the next lowest score if its comment is more specific and actionable.
+
+Step 4: Bullet Point Writing
+
+For each of the four selected competencies, use the corresponding assessor comment as your source.
+
+Rephrase the assessor comment into a single, concise, behavioral sentence. For strengths, use the "Strengths" comment. For development areas, use the "Development Areas" comment.
+
+The bullet points must provide specific behavioral evidence and should not be general statements.
+
+3. Writing Style and Constraints
+Tone: Neutral, professional, objective, and behavioral.
+
+Voice: Third person, present tense only (e.g., "She demonstrates," "He approaches").
+
+Language: American English.
+
+Forbidden Terms: Do not use the names of the competencies (e.g., "Drives Results"). Do not mention scores, numbers, AI, assessments, tools, or the assessment experience. Avoid vague or judgmental words like "good," "poor," "struggles," "strong," or "weak," unless they are part of the required interpretation text.
+
+Pronouns: Use the candidate's correct gender pronouns.
+
+4. Interpretation Matrices
+Overall Leadership Potential Matrix
+| Score Range | Interpretation |
+| :--- | :--- |
+| 3.50 - 5.00 | [First Name] demonstrates high potential for growth and success in a more complex role. |
+| 3.00 - 3.49 | [First Name] demonstrates above average potential for growth and success in a more complex role. |
+| 2.50 - 2.99 | [First Name] demonstrates average potential for growth and success in a more complex role. |
+| 1.00 - 2.49 | [First Name] demonstrates low potential for growth and success in a more complex role. |"""
+
+# --- Level-specific interpretation matrices (only the candidate's own level is sent) ---
+LEVEL_MATRICES = {
+    'APPLY': '''"APPLY" Level Interpretation Matrix
+| Competency | High (3.5-5.0) | Moderate (2.5-3.49) | Low (1.0-2.49) |
+| :--- | :--- | :--- | :--- |
+| Drives Results | Consistently demonstrates high motivation and initiative to exceed expectations. A strong drive to achieve goals, targets, and results. Seeks fulfillment through impact. Drives a high-performance culture across teams and demonstrates grit and persistence when working toward ambitious targets. | Demonstrates motivation and takes initiative occasionally. Demonstrates a drive to achieve goals, but may need support. Interest in making an impact is present but not sustained. Moderate ability to articulate performance standards that contribute to achieving organisational goals. Occasionally supports performance across teams and shows persistence when working towards goals. | Demonstrates limited motivation or initiative; may meet expectations but does not show a consistent drive to exceed them. Fulfillment from work or desire to make an impact is not clearly evident. Low ability to articulate performance standards that support organisational goals. Needs development in fostering a high-performance culture and in maintaining persistence when faced with challenging goals. |
+| Leads People | Consistently takes time to focus on both personal and professional growth - for both self and others. Actively pursues continuous improvement and excellence; shows clear willingness to learn and unlearn. Strongly supports development of others by identifying and leveraging individual strengths. Advocates for learning and career growth, contributing to a culture of learning and continuous improvement. | Focuses on personal and professional growth for self and others and engages in learning activities but may not do so consistently. Displays willingness to learn and unlearn. Recognizes others’ development needs and offers support, though may not consistently nurture growth or advocate for talent advancement. | Has an opportunity to focus more on personal and professional growth for self and others. Can increase engagement in learning activities and become more receptive to feedback. Would benefit from taking a greater interest in developing others and contributing to a learning environment. |
+| Manages Stakeholders| Consistently shows capability to lead and inspire others. Displays strong empathy, understanding, and a focus on people. Builds relationships with ease and enjoys social interaction. Demonstrates strong ability to engage key stakeholders, build trust-based relationships, and find synergies for mutual outcomes. Proactively networks and stays connected across internal and external touchpoints. | Displays some ability to lead and inspire others. May show empathy and focus on people inconsistently. Moderate ability to maintain and build relationships with key stakeholders. Often identifies synergies for positive outcomes. Occasionally proactively networks. | Demonstrates limited capability in leading or inspiring others. Social interaction may be minimal or strained. Struggles to build and maintain relationships. Rarely engages with stakeholders and does not leverage relationships for mutual outcomes. Limited presence in networks or cross-functional collaboration. |
+| Thinks Strategically| Approaches work with a strong focus on the bigger picture. Operates independently with minimal guidance. Demonstrates a commercial and strategic mindset, regularly anticipating trends and their impact. Effectively balances short-term goals with long-term organizational value. Translates complex goals into clear team actions and helps others understand broader implications. | Demonstrates some awareness of the bigger picture but may need occasional guidance. Understands strategy in parts but may not consistently anticipate trends or broader implications. Occasionally translates organisational goals into meaningful actions. Can focus on both immediate and longer-term needs but may favor one over the other. | Focus tends to be on immediate tasks, creating an opportunity to develop a greater awareness of the bigger picture. Benefits from guidance to connect daily work with the broader strategic direction. Development can be focused on translating organizational priorities into meaningful actions. |
+| Solves Challenges | Consistently addresses problems and challenges with confidence and resilience. Takes a diligent, practical, and solution-focused approach. Comfortable navigating ambiguity and complexity. Makes sound decisions under pressure and thrives in environments with multiple demands. | Has the ability to address problems but may need time or support to build confidence and resilience. Attempts a practical approach but not always solution-focused. Moderate ability to handle ambiguity and complex envrionments. Shows some confidence in leading through uncertain environments. | Struggles to address problems confidently. May rely heavily on others. Practical or solution-oriented approaches are limited. Avoids complexity and ambiguity. Rarely takes initiative in resolving obstacles. |
+| Steers Change | Thrives in change and complexity. Manages new ways of working with adaptability, flexibility, and decisiveness during change. Plays an active role in transformation initiatives, shows strong resilience, and enables buy-in and alignment from others during change. | Demonstrates ability to cope with change and can adapt when needed. May need support to remain flexible or decisive in uncertain situations. Contributes to organisational change initiatives, may enable buy-in and shows resilience during challenging times. | Struggles with change or uncertainty. May resist new ways of working and has difficulty adapting or deciding in changing circumstances. Rarely contributes to transformation efforts and finds it difficult to stay resilient under shifting demands. Has difficulty enabling buy-in and support. |''',
+    'GUIDE': '''"GUIDE" Level Interpretation Matrix
+| Competency | High (3.5-5.0) | Moderate (2.5-3.49) | Low (1.0-2.49) |
+| :--- | :--- | :--- | :--- |
+| Drives Results | Consistently demonstrates high motivation and initiative to exceed expectations. A strong drive to achieve goals, targets, and results. Seeks fulfillment through impact. Supports and guides team to deliver goals on time. Recognizes high performance, addresses underperformance, displays grit, and manages resources effectively. | Demonstrates motivation and takes initiative occasionally. Demonstrates a drive to achieve goals, but may need support. Interest in making an impact is present but not sustained. Supports team delivery but may need prompting. Occasionally recognizes performance and addresses underperformance. Shows some grit and manages resources with support. | Demonstrates limited motivation or initiative; may meet expectations but does not show a consistent drive to exceed them. Fulfillment from work or desire to make an impact is not clearly evident. Limited support for team delivery. Rarely recognizes performance or addresses underperformance. Struggles with grit and resource management. |
+| Leads People | Consistently takes time to focus on both personal and professional growth - for both self and others. Actively pursues continuous improvement and excellence; shows clear willingness to learn and unlearn. Coaches key talent with timely, constructive feedback. Builds capability by offering challenging development opportunities. | Focuses on personal and professional growth for self and others and engages in learning activities but may not do so consistently. Displays willingness to learn and unlearn. Provides feedback and guidance, though not always timely or targeted. Offers some development opportunities, but impact may vary. | Has an opportunity to focus more on personal and professional growth. Would benefit from providing more consistent, meaningful feedback. Development can focus on coaching talent effectively and building individual capability through challenging opportunities. |
+| Manages Stakeholders| Consistently shows capability to lead and inspire others. Displays strong empathy, understanding, and a focus on people. Builds relationships with ease and enjoys social interaction. Builds strong relationships to achieve team goals. Understands stakeholder interests and creates long-term partnerships through relationship-building efforts. | Displays some ability to lead and inspire others. May show empathy and focus on people inconsistently. Moderate ability to maintain and build relationships with key stakeholders. Builds relationships when needed to meet goals. Some awareness of stakeholder interests. Maintains connections, but may not actively deepen them. | Demonstrates limited capability in leading or inspiring others. Social interaction may be minimal or strained. Struggles to build and maintain relationships. Engages with stakeholders minimally. Limited understanding of mutual interests. Rarely invests in building or maintaining long-term relationships. |
+| Thinks Strategically| Approaches work with a strong focus on the bigger picture. Operates independently with minimal guidance. Demonstrates a commercial and strategic mindset, regularly anticipating trends and their impact. Considers both short- and long-term impact of decisions. Translates departmental strategy into clear, meaningful actions for self and others. | Demonstrates some awareness of the bigger picture but may need occasional guidance. Understands strategy in parts but may not consistently anticipate trends or broader implications. Acknowledges short- and long-term implications, though not always fully. Can link strategy to actions but may need support or clarification. | Focus tends to be on immediate tasks, creating an opportunity to develop a greater awareness of the bigger picture. Benefits from guidance to connect work with strategic direction. Development can be focused on anticipating trends and turning departmental strategy into clear actions. |
+| Solves Challenges | Consistently addresses problems and challenges with confidence and resilience. Takes a diligent, practical, and solution-focused approach. Manages conflicting departmental and people priorities effectively and consistently weighs them when making decisions. | Has the ability to address problems but may need time or support to build confidence and resilience. Attempts a practical approach but not always solution-focused. Manages departmental and people priorities but may not always weigh them evenly when making decisions. | Struggles to address problems confidently. May rely heavily on others. Practical or solution-oriented approaches are limited. Struggles to manage conflicting priorities and rarely weighs them appropriately when making decisions. |
+| Steers Change | Thrives in change and complexity. Manages new ways of working with adaptability, flexibility, and decisiveness during change. Acts as a role model for positive change, inspiring others and clearly translating the change journey into defined actions. | Demonstrates ability to cope with change and can adapt when needed. May need support to remain flexible or decisive in uncertain situations. Supports change efforts and sometimes inspires others, but may need help translating the journey into clear actions. | Struggles with change or uncertainty. May resist new ways of working and has difficulty adapting or deciding in changing circumstances. Rarely acts as a role model for change and struggles to inspire or define clear actions in the change journey. |''',
+    'SHAPE': '''"SHAPE" Level Interpretation Matrix
+| Competency | High (3.5-5.0) | Moderate (2.5-3.49) | Low (1.0-2.49) |
+| :--- | :--- | :--- | :--- |
+| Drives Results | Consistently demonstrates high motivation and initiative to exceed expectations. A strong drive to achieve goals, targets, and results. Seeks fulfillment through impact. High focus on achieving outcomes against set targets and delivers consistent performance to exceed own goals. Shows perseverance and determination to achieve tasks and goals despite challenges. | Demonstrates motivation and takes initiative occasionally. Demonstrates a drive to achieve goals, but may need support. Interest in making an impact is present but not sustained. Moderate focus on outcomes and performance tracking; may occasionally lack focus. Shows perseverance to achieve tasks but may require support in overcoming setbacks or challenges. | Demonstrates limited motivation or initiative; may meet expectations but does not show a consistent drive to exceed them. Fulfillment from work or desire to make an impact is not clearly evident. Low focus on outcomes; may not track performance against goals consistently. There may be a lack of perseverance and problem-solving when faced with setbacks. |
+| Leads People | Consistently takes time to focus on both personal and professional growth - for both self and others. Actively pursues continuous improvement and excellence; shows clear willingness to learn and unlearn. Strong ability to resolve problems with team members proactively and achieve common goals. Makes contributions on a continual basis, creates trust and teamwork. | Focuses on personal and professional growth and engages in learning activities but may not do so consistently. Moderate openness to learning and unlearning. Cooperates with team members in most situations but may need guidance to work through conflicts. Makes contributions intermittently and may not always address conflicts when they arise. | Has an opportunity to focus more on personal and professional growth and become more receptive to learning. Would benefit from working more collaboratively to resolve conflicts and achieve common goals. Can increase contributions to build trust within the team. |
+| Manages Stakeholders| Consistently shows capability to lead and inspire others. Displays strong empathy, understanding, and a focus on people. Builds relationships with ease and enjoys social interaction. Strong ability to identify and build relationships and connections. Understands stakeholder needs and mutual interests. Works to build long-term relationships. | Displays some ability to lead and inspire others. May show empathy and focus on people but not consistently. Builds relationships but may need support. May have only partial understanding of stakeholder needs and mutual interests. Works to build long-term relationships but may be inconsistent. | Demonstrates limited capability in leading or inspiring others. Social interaction may be minimal or strained. Struggles to build and maintain relationships. Demonstrates limited understanding of stakeholder needs or interdependencies, and does not work to build long-term relationships. |
+| Thinks Strategically| Approaches work with a strong focus on the bigger picture. Operates independently with minimal guidance. Demonstrates a commercial and strategic mindset, regularly anticipating trends and their impact. Understands potential risks and seeks guidance to address the issues. Strong ability to revise strategies based on team needs while prioritising tasks accordingly in order to meet set deadlines. | Demonstrates awareness of the bigger picture but may need occasional guidance. Understands strategy in parts but may not consistently anticipate trends or broader implications. Can identify risks with some guidance and seeks input occasionally to address issues. Demonstrates some ability to revise plans but may need reminders to prioritise effectively. | Focus tends to be on immediate tasks, creating an opportunity to develop a greater awareness of the bigger picture. Benefits from guidance to align goals with team direction and recognize potential risks. Development can focus on addressing issues and revising plans with greater independence. |
+| Solves Challenges | Consistently addresses problems and challenges with confidence and resilience. Takes a diligent, practical, and solution-focused approach to solving issues. Will likely remain composed in the face of setbacks and approach problems with a positive “can do” attitude. | Demonstrates ability to address problems but may need support or time to build confidence and resilience. Attempts a practical approach but not always solution-focused. Moderate ability to identify issues proactively, and takes action when promoted. Sometimes may struggle to remain composed under pressure. | Struggles to address problems confidently. May rely heavily on others and may not take a practical or solution-oriented approach. Does not prioritise working with others to solve problems and identify solutions. Struggles to remain composed under pressure or maintain a positive approach. |
+| Steers Change | Thrives in change and complexity in the workplace. Manages new ways of working with adaptability, flexibility, and decisiveness during uncertainty. Supports implementation of new change initiatives and takes appropriate follow-up action. | Generally copes with change and can adapt when needed. May need support to remain flexible or decisive in uncertain situations. Operates with a degree of comfort when facts are not fully available and support change initiatives, but follow-up action may be delayed or inconsistent. | Struggles with change or uncertainty. May resist new ways of working and has difficulty adapting or deciding in changing circumstances. May be uncomfortable operating when facts are unclear and is unlikely to support change initiatives. |''',
+}
+
+# --- Per-candidate section (always last, so the prefix above stays stable) ---
+CANDIDATE_INSTRUCTION = "Now, using the rules and interpretation matrices in the Appendix above, generate a report for the new candidate data provided."
+
+CANDIDATE_DATA_TEMPLATE = """CANDIDATE DATA TO PROCESS:
+
+First Name: {name}
+
+Gender: {gender}
+
+Level: {level}
+
+Scores:
+
+Overall_Leadership: {Overall_Leadership}
+
+Drives_Results: {Drives_Results}
+
+Leads_People: {Leads_People}
+
+Manages_Stakeholders: {Manages_Stakeholders}
+
+Thinks_Strategically: {Thinks_Strategically}
+
+Solves_Challenges: {Solves_Challenges}
+
+Steers_Change: {Steers_Change}
+
+Assessor Strength Comments:
+
+Drives_Results: {s_Drives_Results}
+
+Leads_People: {s_Leads_People}
+
+Manages_Stakeholders: {s_Manages_Stakeholders}
+
+Thinks_Strategically: {s_Thinks_Strategically}
+
+Solves_Challenges: {s_Solves_Challenges}
+
+Steers_Change: {s_Steers_Change}
+
+Assessor Development Area Comments:
+
+Drives_Results: {d_Drives_Results}
+
+Leads_People: {d_Leads_People}
+
+Manages_Stakeholders: {d_Manages_Stakeholders}
+
+Thinks_Strategically: {d_Thinks_Strategically}
+
+Solves_Challenges: {d_Solves_Challenges}
+
+Steers_Change: {d_Steers_Change}"""
+
+
+CANDIDATE_TEMPLATE = CANDIDATE_INSTRUCTION + "\n\n" + CANDIDATE_DATA_TEMPLATE
+
+# --- Multi-candidate (batched) requests ---
+BATCH_INSTRUCTION = """Now, using the rules and interpretation matrices in the Appendix above, generate a separate report for each of the {count} candidates below. Apply every rule to each candidate independently and use only that candidate's own data.
+
+Return a JSON array with exactly one object per candidate, containing:
+- "name": the candidate's first name, exactly as given.
+- "summary": the summary paragraph.
+- "strengths": the two strength bullet points, one sentence each.
+- "development_areas": the two development area bullet points, one sentence each.
+Do not use markdown inside the JSON values."""
+
+BATCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "name": {"type": "STRING"},
+            "summary": {"type": "STRING"},
+            "strengths": {"type": "ARRAY", "items": {"type": "STRING"}},
+            "development_areas": {"type": "ARRAY", "items": {"type": "STRING"}},
+        },
+        "required": ["name", "summary", "strengths", "development_areas"],
+    },
+}
+
+BATCH_GENERATION_CONFIG = {
+    "responseMimeType": "application/json",
+    "responseSchema": BATCH_RESPONSE_SCHEMA,
+}
+
+# --- Corrective re-generation of reports that break the Appendix rules ---
+CORRECTION_TEMPLATE = """Your previous report for this candidate broke the following Appendix rules:
+{violations}
+
+Previous report:
+{previous_report}
+
+Rewrite the report so that it follows every rule in the Appendix and fixes each issue listed above. Keep the same output format."""
+
+# --- Precompiled templates ---
+STATIC_PREFIX = PROMPT_INTRO_AND_EXAMPLES + "\n\n" + APPENDIX_RULES
+ALL_LEVELS_MATRICES = "\n\n".join(LEVEL_MATRICES.values())
+
+
+def _compile_template(template):
+    """Parses a str.format template once into (literal text, field name, format spec) parts."""
+    return [
+        (literal, field_name, format_spec)
+        for literal, field_name, format_spec, _ in string.Formatter().parse(template)
+    ]
+
+
+_CANDIDATE_PARTS = _compile_template(CANDIDATE_TEMPLATE)
+_CANDIDATE_DATA_PARTS = _compile_template(CANDIDATE_DATA_TEMPLATE)
+
+
+def build_format_dict(candidate_data, strength_comments, dev_comments):
+    """Creates a single dictionary with all keys transformed to use underscores (s_/d_ prefixes for comments)."""
+    format_dict = {}
+    for k, v in candidate_data.items():
+        format_dict[str(k).replace(' ', '_')] = v
+    for k, v in strength_comments.items():
+        format_dict[f"s_{str(k).replace(' ', '_')}"] = v
+    for k, v in dev_comments.items():
+        format_dict[f"d_{str(k).replace(' ', '_')}"] = v
+    return format_dict
+
+
+def _render(parts, format_dict):
+    pieces = []
+    for literal, field_name, format_spec in parts:
+        pieces.append(literal)
+        if field_name is not None:
+            pieces.append(format(format_dict[field_name], format_spec))
+    return "".join(pieces)
+
+
+def render_candidate_section(format_dict):
+    """Fills the precompiled candidate section. Raises KeyError for a missing field, like str.format."""
+    return _render(_CANDIDATE_PARTS, format_dict)
+
+
+def level_matrix(level):
+    """Returns the interpretation matrix for a level, or all matrices if the level is not recognised."""
+    return LEVEL_MATRICES.get(str(level).strip().upper(), ALL_LEVELS_MATRICES)
+
+
+def level_section(level, facts_text=None):
+    """Returns the level-specific section: precomputed rule engine facts if given, otherwise the level matrix."""
+    return facts_text if facts_text else level_matrix(level)
+
+
+def build_prompt(candidate_data, strength_comments, dev_comments, facts_text=None):
+    """Builds the final prompt: static prefix, then the level section, then the candidate data."""
+    format_dict = build_format_dict(candidate_data, strength_comments, dev_comments)
+    return "\n\n".join([
+        STATIC_PREFIX,
+        level_section(candidate_data.get('level'), facts_text),
+        render_candidate_section(format_dict),
+    ])
+
+
+def estimate_tokens(text):
+    """Rough token estimate (about 4 characters per token), used for the per-run savings report."""
+    return len(text) // 4
+
+
+def estimate_tokens_saved(level, facts_text=None):
+    """Estimates the input tokens saved for one candidate compared with sending all three matrices."""
+    return estimate_tokens(ALL_LEVELS_MATRICES) - estimate_tokens(level_section(level, facts_text))
+
+
+def build_batch_prompt(entries):
+    """Builds one prompt for several candidates, answered as JSON matching BATCH_RESPONSE_SCHEMA.
+
+    entries are (candidate_data, strength_comments, dev_comments, facts_text) tuples. The static prefix comes
+    first as usual, followed by each needed level matrix once, then every candidate's facts and data.
+    """
+    sections = [STATIC_PREFIX]
+    sections.extend(dict.fromkeys(
+        level_matrix(candidate_data.get('level')) for candidate_data, _, _, facts_text in entries if not facts_text
+    ))
+    sections.append(BATCH_INSTRUCTION.format(count=len(entries)))
+    for number, (candidate_data, strength_comments, dev_comments, facts_text) in enumerate(entries, start=1):
+        format_dict = build_format_dict(candidate_data, strength_comments, dev_comments)
+        block = [f"=== CANDIDATE {number} OF {len(entries)} ==="]
+        if facts_text:
+            block.append(facts_text)
+        block.append(_render(_CANDIDATE_DATA_PARTS, format_dict))
+        sections.append("\n\n".join(block))
+    return "\n\n".join(sections)
+
+
+def build_corrective_prompt(prompt, previous_report, violations):
+    """Appends the rule violations and the rejected report to a candidate's original prompt.
+
+    The original prompt is kept unchanged in front, so the shared static prefix stays cacheable.
+    """
+    return prompt + "\n\n" + CORRECTION_TEMPLATE.format(
+        violations="\n".join(f"- {violation}" for violation in violations), previous_report=previous_report
+    )
+
+
+def format_structured_report(report):
+    """Renders one structured (JSON) report in the same markdown layout as a single-candidate response."""
+    return "\n\n".join([
+        report['summary'].strip(),
+        "**Strengths:**",
+        "\n".join(f"* {item.strip()}" for item in report['strengths']),
+        "**Development Areas:**",
+        "\n".join(f"* {item.strip()}" for item in report['development_areas']),
+    ])
+
+
+def _is_valid_report(report):
+    return (
+        isinstance(report, dict)
+        and isinstance(report.get('name'), str)
+        and isinstance(report.get('summary'), str) and report['summary'].strip() != ""
+        and all(
+            isinstance(report.get(key), list) and report[key] and all(isinstance(item, str) for item in report[key])
+            for key in ('strengths', 'development_areas')
+        )
+    )
+
+
+def parse_batch_response(response_text, expected_names):
+    """Parses a batched JSON response into {name: report text} for the candidates that came back valid.
+
+    A name is only accepted if it was requested and appears exactly once with a well-formed report; anything
+    else (missing, duplicated or malformed) is left out so the caller can re-queue it on its own.
+    """
+    try:
+        reports = json.loads(response_text)
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(reports, list):
+        return {}
+
+    expected = {str(name) for name in expected_names}
+    returned_names = [str(report.get('name', '')).strip() for report in reports if isinstance(report, dict)]
+    parsed = {}
+    for report in reports:
+        if not _is_valid_report(report):
+            continue
+        name = report['name'].strip()
+        if name in expected and returned_names.count(name) == 1:
+            parsed[name] = format_structured_report(report)
+    return parsed
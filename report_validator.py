@@ -0,0 +1,111 @@
+import re
+
+from response_cache import is_error_response
+from rule_engine import COMPETENCIES, MATRIX_PHRASES
+
+# --- Appendix rules checked locally on every returned summary ---
+MAX_WORDS = 149  # "strictly less than 150 words"
+REQUIRED_STRENGTHS = 2
+REQUIRED_DEVELOPMENT_AREAS = 2
+FORBIDDEN_WORDS = ['good', 'poor', 'struggles', 'struggle', 'strong', 'weak', 'AI', 'assessment', 'assessments',
+                   'assessor', 'assessors', 'tool', 'tools']
+WRONG_PRONOUNS = {
+    'female': ['he', 'him', 'his', 'himself'],
+    'male': ['she', 'her', 'hers', 'herself'],
+}
+VALID_STATUS = "OK"
+
+_WORD = re.compile(r"[A-Za-z0-9]+(?:['’-][A-Za-z0-9]+)*")
+_HEADING = re.compile(r'^\W*(strengths?|development areas?)\W*$', re.IGNORECASE)
+_BULLET = re.compile(r'^\s*[*•-]\s+\S')
+_NUMBER = re.compile(r'\d')
+# Only the Title Case and underscore forms ("Drives Results", "Drives_Results"): the same words in lower case
+# are ordinary prose ("solves challenges with confidence")
+_COMPETENCY = re.compile('|'.join(r'\b' + re.escape(name).replace(r'\ ', r'[ _]') + r'\b' for name in COMPETENCIES))
+# 'AI' only as the upper-case acronym; everything else case-insensitively
+_FORBIDDEN = re.compile(
+    r'\b(?:AI|(?i:' + '|'.join(re.escape(word) for word in FORBIDDEN_WORDS if word != 'AI') + r'))\b'
+)
+# Forbidden words are allowed inside the interpretation matrix wording, which reports quote verbatim
+_MATRIX_SENTENCES = re.compile(
+    '|'.join(sorted(
+        {re.escape(sentence.strip().rstrip('.')) for phrase in MATRIX_PHRASES for sentence in re.split(r'(?<=\.)\s', phrase) if sentence.strip()},
+        key=len, reverse=True,
+    )),
+    re.IGNORECASE,
+)
+
+
+def _bullet_counts(lines):
+    """Returns the number of bullets under the Strengths and Development Areas headings."""
+    counts = {'strength': 0, 'development': 0}
+    section = None
+    for line in lines:
+        heading = _HEADING.match(line.replace('*', ''))
+        if heading:
+            section = 'strength' if heading.group(1).lower().startswith('strength') else 'development'
+        elif section and _BULLET.match(line):
+            counts[section] += 1
+    return counts
+
+
+def validate_report(text, gender=None, comments=(), name=None):
+    """Checks a summary against the Appendix output rules. Returns a list of violation tags (empty if compliant).
+
+    comments are the candidate's assessor comments: bullets rephrase them, so a forbidden word the assessor
+    used (e.g. "strong ability") is not counted against the report. The candidate's name is ignored by the
+    number check, as exports sometimes use IDs as names.
+    """
+    lines = text.splitlines()
+    violations = []
+
+    word_count = sum(len(_WORD.findall(line)) for line in lines if not _HEADING.match(line.replace('*', '')))
+    if word_count > MAX_WORDS:
+        violations.append(f"word_count: {word_count} words (must be under {MAX_WORDS + 1})")
+
+    counts = _bullet_counts(lines)
+    if counts['strength'] != REQUIRED_STRENGTHS:
+        violations.append(f"strength_bullets: {counts['strength']} (expected {REQUIRED_STRENGTHS})")
+    if counts['development'] != REQUIRED_DEVELOPMENT_AREAS:
+        violations.append(f"development_bullets: {counts['development']} (expected {REQUIRED_DEVELOPMENT_AREAS})")
+
+    competency_names = sorted({match.group(0) for match in _COMPETENCY.finditer(text)})
+    if competency_names:
+        violations.append(f"competency_name: {', '.join(competency_names)}")
+
+    if _NUMBER.search(text.replace(str(name), ' ') if name is not None else text):
+        violations.append("number: mentions scores or numbers")
+
+    forbidden = {match.group(0).lower() for match in _FORBIDDEN.finditer(_MATRIX_SENTENCES.sub(' ', text))}
+    forbidden = sorted(forbidden - {match.group(0).lower() for comment in comments for match in _FORBIDDEN.finditer(str(comment))})
+    if forbidden:
+        violations.append(f"forbidden_word: {', '.join(forbidden)}")
+
+    wrong_pronouns = WRONG_PRONOUNS.get(str(gender).strip().lower(), [])
+    found = sorted({word.lower() for word in _WORD.findall(text) if word.lower() in wrong_pronouns})
+    if found:
+        violations.append(f"pronoun: {', '.join(found)} used for a {str(gender).strip().lower()} candidate")
+    return violations
+
+
+def candidate_comments(strength_comments, dev_comments):
+    """Returns the assessor comments of one candidate as the list validate_report expects."""
+    return [str(comments.get(name, '')) for comments in (strength_comments, dev_comments) for name in COMPETENCIES]
+
+
+def validation_status(text, gender=None, comments=(), name=None):
+    """Returns the validation status written to the output sheet: 'OK', 'Error' or the '; '-joined violations."""
+    if is_error_response(text):
+        return "Error"
+    return "; ".join(validate_report(text, gender, comments, name)) or VALID_STATUS
+
+
+def add_validation_status(results, prepared_candidates):
+    """Adds a 'validation' status to each {'name', 'summary'} result dict, in place, and returns the results."""
+    for result in results:
+        candidate_data, strength_comments, dev_comments = prepared_candidates[result['name']]
+        result['validation'] = validation_status(
+            result['summary'], candidate_data.get('gender'), candidate_comments(strength_comments, dev_comments),
+            result['name']
+        )
+    return results
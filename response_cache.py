@@ -0,0 +1,98 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "gemini_responses.sqlite3")
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_AGE_DAYS = 30
+
+
+def make_cache_key(model_name, prompt):
+    """Returns the cache key for a prompt: a SHA-256 hash of the model name plus the fully formatted prompt."""
+    return hashlib.sha256(f"{model_name}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+def is_error_response(text):
+    """Returns True for the error strings produced by call_gemini_api, which must never be cached."""
+    return not isinstance(text, str) or not text.strip() or text.startswith("Error:")
+
+
+class ResponseCache:
+    """On-disk SQLite cache of Gemini responses, keyed by model name and prompt.
+
+    Entries older than max_age_days are dropped, and the least recently used entries are evicted
+    once the cache holds more than max_entries. hits/misses count lookups made through this instance.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, model_name, prompt):
+        """Returns the cached response for this model and prompt, or None on a miss."""
+        key = make_cache_key(model_name, prompt)
+        min_created_at = time.time() - self.max_age_days * 86400
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at >= ?", (key, min_created_at)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, model_name, prompt, response):
+        """Stores a successful response. Error responses are ignored so they are retried on the next run."""
+        if is_error_response(response):
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (make_cache_key(model_name, prompt), model_name, response, now, now),
+            )
+            self._conn.commit()
+
+    def evict(self):
+        """Removes expired entries, then the least recently used ones beyond max_entries. Returns the number removed."""
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age_days * 86400,)
+            ).rowcount
+            removed += self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            self._conn.commit()
+            return removed
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,201 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from prompt_builder import APPENDIX_RULES, LEVEL_MATRICES
+
+COMPETENCIES = [
+    'Drives Results',
+    'Leads People',
+    'Manages Stakeholders',
+    'Thinks Strategically',
+    'Solves Challenges',
+    'Steers Change',
+]
+STRENGTH_THRESHOLD = 3.5  # Scores of 3.5 or above are High and always strengths
+DEVELOPMENT_THRESHOLD = 2.5  # Scores below 2.5 (the Appendix's "2.49 or below") are Low and always development areas
+
+PRONOUNS = {
+    'female': ('She', 'Her'),
+    'male': ('He', 'His'),
+}
+DEFAULT_PRONOUNS = ('They', 'Their')
+
+
+# --- Appendix table parsing (the prompt text is the single source of truth) ---
+def _parse_markdown_table(text):
+    """Returns the header and body rows of the first markdown table in text."""
+    rows = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line.startswith('|'):
+            if rows:
+                break
+            continue
+        if line.startswith('| :---'):
+            continue
+        rows.append([cell.strip() for cell in line.strip('|').split('|')])
+    return rows[0], rows[1:]
+
+
+def _parse_overall_matrix():
+    """Returns [(lower bound, sentence template)] from the Overall Leadership Potential Matrix, highest band first."""
+    _, rows = _parse_markdown_table(APPENDIX_RULES.split('Overall Leadership Potential Matrix', 1)[1])
+    bands = [(float(score_range.split('-')[0]), sentence) for score_range, sentence in rows]
+    return sorted(bands, reverse=True)
+
+
+def _parse_level_matrices():
+    """Returns a Series of matrix wording indexed by (level, competency, band)."""
+    entries = {}
+    for level, matrix_text in LEVEL_MATRICES.items():
+        header, rows = _parse_markdown_table(matrix_text)
+        bands = [column.split(' ')[0] for column in header[1:]]
+        for row in rows:
+            for band, phrase in zip(bands, row[1:]):
+                entries[(level, row[0], band)] = phrase
+    return pd.Series(entries)
+
+
+OVERALL_BANDS = _parse_overall_matrix()
+MATRIX_PHRASES = _parse_level_matrices()
+
+
+# --- Vectorized cohort computation ---
+def compute_report_facts(scores_df):
+    """Computes the score-driven parts of every report for the whole cohort in one pass.
+
+    Returns a DataFrame indexed by candidate name (first row per name) with the opening sentence, the
+    highest/lowest competencies, the strength and development picks, the threshold-based lists and the
+    interpretation matrix wording for each competency at the candidate's level.
+    """
+    cohort = scores_df.drop_duplicates('name')
+    names = cohort['name'].astype(str).to_numpy()
+    levels = cohort['level'].astype(str).str.strip().str.upper().to_numpy()
+    values = cohort[COMPETENCIES].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    overall = pd.to_numeric(cohort['Overall Leadership'], errors='coerce').to_numpy(dtype=float)
+    competencies = np.array(COMPETENCIES)
+
+    # --- Opening sentence from the Overall Leadership Potential Matrix ---
+    templates = np.select([overall >= lower for lower, _ in OVERALL_BANDS], [t for _, t in OVERALL_BANDS], default='')
+    opening_sentences = [t.replace('[First Name]', n) for t, n in zip(templates, names)]
+
+    # --- Ranking (ties keep the competency order of the template; missing scores rank last) ---
+    order_desc = np.argsort(-np.nan_to_num(values, nan=-np.inf), axis=1, kind='stable')
+    order_asc = np.argsort(np.nan_to_num(values, nan=np.inf), axis=1, kind='stable')
+    sorted_desc = np.take_along_axis(values, order_desc, axis=1)
+    sorted_asc = np.take_along_axis(values, order_asc, axis=1)
+    # 2-3 highest/lowest: the third is included when it ties with the second
+    n_highest = np.where(sorted_desc[:, 2] == sorted_desc[:, 1], 3, 2)
+    n_lowest = np.where(sorted_asc[:, 2] == sorted_asc[:, 1], 3, 2)
+
+    # --- Bands and matrix wording per competency ---
+    bands = np.select(
+        [values >= STRENGTH_THRESHOLD, values >= DEVELOPMENT_THRESHOLD, ~np.isnan(values)],
+        ['High', 'Moderate', 'Low'],
+        default='',
+    )
+    lookup = pd.MultiIndex.from_arrays([
+        np.repeat(levels, len(COMPETENCIES)),
+        np.tile(competencies, len(names)),
+        bands.ravel(),
+    ])
+    phrases = MATRIX_PHRASES.reindex(lookup).to_numpy().reshape(values.shape)
+
+    is_strength = values >= STRENGTH_THRESHOLD
+    is_development = values < DEVELOPMENT_THRESHOLD
+
+    facts = pd.DataFrame({
+        'name': names,
+        'gender': cohort['gender'].to_numpy(),
+        'level': levels,
+        'opening_sentence': opening_sentences,
+        'highest_competencies': [list(competencies[o[:n]]) for o, n in zip(order_desc, n_highest)],
+        'lowest_competencies': [list(competencies[o[:n]]) for o, n in zip(order_asc, n_lowest)],
+        'strength_picks': [list(competencies[o[:2]]) for o in order_desc],
+        'development_picks': [list(competencies[o[:2]]) for o in order_asc],
+        'threshold_strengths': [list(competencies[m]) for m in is_strength],
+        'threshold_development_areas': [list(competencies[m]) for m in is_development],
+        'all_high': is_strength.all(axis=1),
+        'bands': [dict(zip(COMPETENCIES, b)) for b in bands],
+        'matrix_phrases': [
+            {c: p for c, p in zip(COMPETENCIES, row) if isinstance(p, str)} for row in phrases
+        ],
+    })
+    return facts.set_index('name', drop=False)
+
+
+# --- Prompt facts ---
+def format_facts_for_prompt(facts):
+    """Formats one candidate's facts as a prompt section that replaces the full level matrix."""
+    used = list(dict.fromkeys(
+        facts['highest_competencies'] + facts['lowest_competencies'] + facts['threshold_strengths'] + facts['threshold_development_areas']
+    ))
+    lines = [
+        "PRECOMPUTED FACTS",
+        "These were derived exactly from the candidate's scores using the rules and matrices above. Use them as given; do not re-derive them.",
+        f"Opening sentence: {facts['opening_sentence']}",
+        f"Highest-scoring competencies: {', '.join(facts['highest_competencies'])}",
+        f"Lowest-scoring competencies: {', '.join(facts['lowest_competencies'])}",
+        f"Strength bullets (use these assessor Strength comments): {', '.join(facts['strength_picks'])}",
+        f"Development bullets (use these assessor Development Area comments): {', '.join(facts['development_picks'])}",
+        f"Always strengths (scores of {STRENGTH_THRESHOLD} or above): {', '.join(facts['threshold_strengths']) or 'None'}",
+        f"Always development areas (scores below {DEVELOPMENT_THRESHOLD}): {', '.join(facts['threshold_development_areas']) or 'None'}",
+        f"All scores high (frame the development area positively): {'Yes' if facts['all_high'] else 'No'}",
+        f"Interpretation wording for the {facts['level'].title()} level:",
+    ]
+    for competency in used:
+        phrase = facts['matrix_phrases'].get(competency)
+        if phrase:
+            lines.append(f"- {competency} ({facts['bands'][competency]}): {phrase}")
+    return "\n".join(lines)
+
+
+# --- Offline draft reports ---
+def _first_sentence(text):
+    return re.split(r'(?<=\.)\s', text.strip(), maxsplit=1)[0]
+
+
+def _with_subject(sentence, subject):
+    """Prefixes a matrix phrase such as 'Consistently demonstrates ...' with the candidate's pronoun."""
+    first_word = sentence.split(' ', 1)[0]
+    if first_word.endswith('ly') or first_word.endswith('s'):
+        return f"{subject} {sentence[:1].lower()}{sentence[1:]}"
+    return sentence
+
+
+def _as_bullet(comment):
+    """Turns an assessor comment into a bullet sentence, dropping the leading 'The candidate'."""
+    text = str(comment).strip()
+    if text.lower().startswith('the candidate '):
+        text = text[len('the candidate '):]
+    text = text[:1].upper() + text[1:]
+    return text if text.endswith('.') else f"{text}."
+
+
+def draft_report(facts, strength_comments, dev_comments):
+    """Builds a report from the rule engine facts and the assessor comments, without calling the API."""
+    subject, possessive = PRONOUNS.get(str(facts['gender']).strip().lower(), DEFAULT_PRONOUNS)
+    phrases = facts['matrix_phrases']
+
+    narrative = [facts['opening_sentence']]
+    # Every picked development area below the threshold is named in the narrative, otherwise just the lowest
+    narrative_developments = [c for c in facts['development_picks'] if c in facts['threshold_development_areas']]
+    for competency in facts['strength_picks'] + (narrative_developments or facts['development_picks'][:1]):
+        if competency in phrases:
+            narrative.append(_with_subject(_first_sentence(phrases[competency]), subject))
+    if facts['all_high']:
+        narrative.append(f"{possessive} development can focus on scaling these strengths for even greater complexity.")
+    else:
+        narrative.append(f"{possessive} primary development areas are outlined below.")
+
+    strengths = [f"* {_as_bullet(strength_comments.get(c, ''))}" for c in facts['strength_picks']]
+    developments = [f"* {_as_bullet(dev_comments.get(c, ''))}" for c in facts['development_picks']]
+    return "\n\n".join([
+        " ".join(narrative),
+        "**Strengths:**",
+        "\n".join(strengths),
+        "**Development Areas:**",
+        "\n".join(developments),
+    ])
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from response_cache import is_error_response
+
+DEFAULT_JOURNAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "runs")
+
+
+def make_run_id(*parts):
+    """Returns a run ID from a SHA-256 hash of the uploaded file contents (bytes) and any settings (strings)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+        digest.update(hashlib.sha256(data).digest())
+    return digest.hexdigest()[:32]
+
+
+class RunJournal:
+    """Append-only JSONL journal of the summaries completed in a run.
+
+    Every summary is written and fsynced as soon as it finishes, so a crash, timeout or browser refresh
+    loses nothing that was already paid for. The latest entry per candidate wins when reading back.
+    """
+
+    def __init__(self, run_id, directory=DEFAULT_JOURNAL_DIR):
+        self.run_id = run_id
+        self.path = os.path.join(directory, f"{run_id}.jsonl")
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._terminate_torn_line()
+
+    def _terminate_torn_line(self):
+        # A crash mid-write can leave a partial last line; end it so the next entry starts on its own line
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, "rb+") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+
+    def append(self, name, summary):
+        """Durably records one completed summary."""
+        line = json.dumps({'name': str(name), 'summary': summary, 'completed_at': time.time()}, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def entries(self):
+        """Returns {name: summary} with the latest entry per candidate. A torn last line from a crash is ignored."""
+        latest = {}
+        if not os.path.exists(self.path):
+            return latest
+        with self._lock:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    latest[entry['name']] = entry['summary']
+        return latest
+
+    def completed(self):
+        """Returns {name: summary} for candidates that finished successfully and can be skipped on resume."""
+        return {name: summary for name, summary in self.entries().items() if not is_error_response(summary)}
+
+    def load_results(self, names):
+        """Assembles the results for names, in that order, from the journal."""
+        latest = self.entries()
+        return [{'name': name, 'summary': latest[str(name)]} for name in names if str(name) in latest]
+
+    def reset_unless_resuming(self, resume=True, bypass_cache=False):
+        """Starts the journal over unless the run resumes. Returns True if it was reset.
+
+        Bypassing the response cache asks for every report to be regenerated, which resuming would skip, so it
+        starts the run over too. Re-running a crashed run with the bypass still on therefore discards the
+        reports it already paid for.
+        """
+        if resume and not bypass_cache:
+            return False
+        self.reset()
+        return True
+
+    def reset(self):
+        """Starts the journal over, discarding any earlier entries for this run."""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,51 @@
+import io
+
+import pandas as pd
+
+# --- Sample data used for the downloadable templates (and the benchmark cohorts) ---
+def sample_frames():
+    """Returns the sample scores and assessor comments DataFrames used for the downloadable templates."""
+    
+    # Sample Data for Scores
+    scores_data = {
+        'name': ['Ayesha', 'Ali', 'Badreyah'],
+        'gender': ['Female', 'Male', 'Female'],
+        'level': ['Guide', 'Apply', 'Apply'],
+        'Overall Leadership': [2.97, 2.55, 3.66],
+        'Drives Results': [3.0, 1.9, 3.9],
+        'Leads People': [3.2, 2.6, 4.2],
+        'Manages Stakeholders': [2.4, 2.4, 4.2],
+        'Thinks Strategically': [3.4, 2.5, 3.9],
+        'Solves Challenges': [3.9, 1.7, 3.9],
+        'Steers Change': [2.9, 2.8, 4.3]
+    }
+    scores_df = pd.DataFrame(scores_data)
+
+    # Sample Data for Assessor Comments
+    comments_data = [
+        {'name': 'Ayesha', 'comment_type': 'Strength', 'Steers Change': 'The candidate demonstrates confidence in navigating periods of change and serves as a role model, creating a positive attitude during change initiatives.', 'Manages Stakeholders': 'The candidate demonstrates effective strategies for identifying relationships that can support the achievement of their individual objectives.', 'Drives Results': 'The candidate demonstrates a committed approach to maintaining consistent performance for themselves and their team across projects.', 'Thinks Strategically': 'The candidate demonstrates a solid understanding of both short-term and long-term strategic approaches to projects.', 'Solves Challenges': 'The candidate demonstrates strong ability to identify issues proactively and develop effective, logical solutions.', 'Leads People': 'The candidate demonstrates the ability to support their team through valuable contributions that aid in the development of team members.'},
+        {'name': 'Ayesha', 'comment_type': 'Development Area', 'Steers Change': 'The candidate would benefit from proactively seeking to understand the underlying reasons for change, to better sustain team motivation and engagement throughout the change process.', 'Manages Stakeholders': 'The candidate would benefit from ensuring that the mutual objectives of relevant stakeholders are aligned and supported, to secure buy-in and sustain long-lasting relationships.', 'Drives Results': 'The candidate would benefit from developing strategies to effectively allocate resources to address the varying priorities within the workload.', 'Thinks Strategically': 'The candidate would benefit from proactively anticipating external industry changes and adjusting plans accordingly to stay ahead of emerging trends.', 'Solves Challenges': 'The candidate would benefit from offering reassurance to team members during challenges and promoting resilience within the team.', 'Leads People': 'The candidate would benefit from effectively resolving conflicts within the team to maintain cohesion and a positive working environment.'},
+        {'name': 'Ali', 'comment_type': 'Strength', 'Steers Change': 'The candidate evidenced being able to effectively navigate ambiguous situations by adapting to task changes.', 'Manages Stakeholders': 'The candidate demonstrates a solid ability to build relationships with key stakeholders within their environment.', 'Drives Results': 'The candidate demonstrates some ability to monitor their performance daily, which can support goal achievement', 'Thinks Strategically': 'The candidate demonstrates moderate awareness of risk factors that could delay project work and proactively seeks support to develop contingency plans.', 'Solves Challenges': 'The candidate demonstrates initiative in addressing project challenges and effectively raises issues with relevant stakeholders', 'Leads People': 'The candidate demonstrates reasonable confidence in collaborating effectively with others to achieve team objectives.'},
+        {'name': 'Ali', 'comment_type': 'Development Area', 'Steers Change': 'The candidate would benefit by following up on actions to ensure change efforts are successful.', 'Manages Stakeholders': 'To strengthen this area, the candidate should allocate additional time to understand the interests and priorities of other stakeholders, to help create win-win situations.', 'Drives Results': 'The candidate provided limited evidence of exceeding goals and would benefit from developing strategies to consistently perform at or above higher-than-expected levels.', 'Thinks Strategically': 'The candidate should work on effectively proposing strategic recommendations that support team growth and long-term success.', 'Solves Challenges': 'The candidate should work on maintaining composure when faced with significant setbacks, to prevent becoming overwhelmed and to better manage challenges.', 'Leads People': 'The candidate would benefit from developing skills to manage disagreements within the team more effectively, ensuring that conflicts do not hinder project progress.'}
+    ]
+    comments_df = pd.DataFrame(comments_data)
+
+    return scores_df, comments_df
+
+# --- Helper Function to create sample Excel files in memory ---
+def create_sample_files():
+    """Creates two sample Excel files (scores and comments) in memory for download."""
+    scores_df, comments_df = sample_frames()
+
+    # Convert DataFrames to Excel format in memory
+    output_scores = io.BytesIO()
+    with pd.ExcelWriter(output_scores, engine='openpyxl') as writer:
+        scores_df.to_excel(writer, index=False, sheet_name='Scores')
+    processed_scores = output_scores.getvalue()
+
+    output_comments = io.BytesIO()
+    with pd.ExcelWriter(output_comments, engine='openpyxl') as writer:
+        comments_df.to_excel(writer, index=False, sheet_name='Comments')
+    processed_comments = output_comments.getvalue()
+    
+    return processed_scores, processed_comments
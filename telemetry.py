@@ -0,0 +1,144 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# USD per 1M tokens: (input, output incl. thinking, cached input). Prompts here stay under the 200k-token tier.
+MODEL_PRICING = {
+    'gemini-2.5-pro': (1.25, 10.00, 0.31),
+    'gemini-2.5-flash': (0.30, 2.50, 0.075),
+    'gemini-2.5-flash-lite': (0.10, 0.40, 0.025),
+}
+
+METRIC_COLUMNS = [
+    'name', 'source', 'model', 'api_key', 'error', 'status', 'batch_size', 'prompt_build_ms', 'queue_wait_ms', 'rate_limit_wait_ms',
+    'http_latency_ms', 'first_text_ms', 'attempts', 'retries', 'corrections', 'rule_violations', 'prompt_tokens',
+    'output_tokens', 'cached_tokens', 'estimated_cost_usd',
+]
+# Summed over every request made for a candidate (e.g. a corrective re-request); other fields keep the latest call
+ADDITIVE_CALL_FIELDS = ['attempts', 'retries', 'prompt_tokens', 'output_tokens', 'cached_tokens', 'estimated_cost_usd']
+
+
+def estimate_cost(model_name, prompt_tokens, output_tokens, cached_tokens=0):
+    """Estimates the USD cost of one call from its token counts (0 for models without a known price)."""
+    input_price, output_price, cached_price = MODEL_PRICING.get(model_name, (0.0, 0.0, 0.0))
+    return (
+        (prompt_tokens - cached_tokens) * input_price + cached_tokens * cached_price + output_tokens * output_price
+    ) / 1_000_000
+
+
+def _mean(series, digits):
+    series = series.dropna()
+    return round(float(series.astype(float).mean()), digits) if len(series) else 0.0
+
+
+def _counts(series):
+    """Formats value counts as 'value: count, ...' for the summary table."""
+    return ", ".join(f"{value}: {count}" for value, count in series.dropna().value_counts().items())
+
+
+class RunTelemetry:
+    """Collects per-candidate timings, retries, token usage and cost for one run. Safe to use from worker threads."""
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.started = time.perf_counter()
+        self.finished = None
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, **fields):
+        """Merges fields into the candidate's record (created on first use)."""
+        with self._lock:
+            record = self._records.setdefault(str(name), {'name': str(name)})
+            record.update(fields)
+
+    def record_call(self, names, submitted_at, started_at, call_metrics):
+        """Records one API request (single or batched) for each candidate it covered.
+
+        Token counts and cost of a batched request are split evenly between its candidates, and added to those
+        of any earlier request for the same candidate. Cost is priced for the model that answered.
+        """
+        share = 1.0 / len(names)
+        model_name = call_metrics.get('model') or self.model_name
+        prompt_tokens = call_metrics.get('prompt_tokens', 0)
+        output_tokens = call_metrics.get('output_tokens', 0)
+        cached_tokens = call_metrics.get('cached_tokens', 0)
+        for name in names:
+            self._record_call_fields(
+                name,
+                source='api',
+                model=model_name,
+                api_key=call_metrics.get('api_key'),
+                status=call_metrics.get('status'),
+                batch_size=len(names),
+                queue_wait_ms=round((started_at - submitted_at + call_metrics.get('rate_limit_wait', 0.0)) * 1000, 1),
+                rate_limit_wait_ms=round(call_metrics.get('rate_limit_wait', 0.0) * 1000, 1),
+                http_latency_ms=round(call_metrics.get('http_seconds', 0.0) * 1000, 1),
+                # Only streamed requests have a time to first text
+                first_text_ms=round(call_metrics['first_text_seconds'] * 1000, 1) if 'first_text_seconds' in call_metrics else None,
+                attempts=call_metrics.get('attempts', 0),
+                retries=call_metrics.get('retries', 0),
+                prompt_tokens=round(prompt_tokens * share),
+                output_tokens=round(output_tokens * share),
+                cached_tokens=round(cached_tokens * share),
+                estimated_cost_usd=estimate_cost(model_name, prompt_tokens, output_tokens, cached_tokens) * share,
+            )
+
+    def _record_call_fields(self, name, **fields):
+        with self._lock:
+            record = self._records.setdefault(str(name), {'name': str(name)})
+            for field in ADDITIVE_CALL_FIELDS:
+                if record.get(field) is not None:
+                    fields[field] += record[field]
+            record.update(fields)
+
+    def finish(self):
+        """Marks the end of the run, freezing elapsed time and throughput."""
+        self.finished = time.perf_counter()
+
+    def records_frame(self):
+        with self._lock:
+            records = [dict(record) for record in self._records.values()]
+        return pd.DataFrame(records).reindex(columns=METRIC_COLUMNS)
+
+    def summary(self):
+        """Returns the run-level metrics: counts, latency percentiles, tokens, cost and throughput."""
+        frame = self.records_frame()
+        api_calls = frame[frame['source'] == 'api']
+        latencies = api_calls['http_latency_ms'].dropna().to_numpy(dtype=float)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0.0, 0.0, 0.0)
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        completed = int(frame['source'].notna().sum())
+        return {
+            'model': self.model_name,
+            'candidates completed': completed,
+            'from API': len(api_calls),
+            'from cache': int((frame['source'] == 'cache').sum()),
+            'reports by model': _counts(api_calls['model']),
+            'reports by key': _counts(api_calls['api_key']),
+            'errors': int(frame['error'].fillna(False).astype(bool).sum()),
+            'elapsed (s)': round(elapsed, 1),
+            'throughput (candidates/min)': round(completed / elapsed * 60, 1) if elapsed > 0 else 0.0,
+            'HTTP latency p50 (ms)': round(float(p50), 1),
+            'HTTP latency p95 (ms)': round(float(p95), 1),
+            'HTTP latency p99 (ms)': round(float(p99), 1),
+            'avg time to first text (ms)': _mean(api_calls['first_text_ms'], 1),
+            'avg prompt build (ms)': _mean(frame['prompt_build_ms'], 2),
+            'avg queue wait (ms)': _mean(api_calls['queue_wait_ms'], 1),
+            'total retries': int(api_calls['retries'].sum()),
+            'corrective re-requests': int(frame['corrections'].sum()),
+            'reports failing validation': int((frame['rule_violations'] > 0).sum()),
+            'prompt tokens': int(api_calls['prompt_tokens'].sum()),
+            'output tokens': int(api_calls['output_tokens'].sum()),
+            'cached prompt tokens': int(api_calls['cached_tokens'].sum()),
+            'estimated cost (USD)': round(float(api_calls['estimated_cost_usd'].sum()), 4),
+        }
+
+
+def write_metrics_sheet(writer, telemetry, sheet_name='Run Metrics'):
+    """Writes the run summary followed by the per-candidate metrics table to an Excel sheet."""
+    summary = pd.DataFrame(list(telemetry.summary().items()), columns=['metric', 'value'])
+    summary.to_excel(writer, index=False, sheet_name=sheet_name)
+    telemetry.records_frame().to_excel(writer, index=False, sheet_name=sheet_name, startrow=len(summary) + 2)
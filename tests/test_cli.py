@@ -0,0 +1,21 @@
+import pandas as pd
+import pytest
+
+from cli import parse_args, run
+from sample_data import sample_frames
+
+
+@pytest.mark.parametrize('extension', ['.xlsx', '.parquet'])
+def test_numeric_candidate_names_are_joined_to_their_comments(tmp_path, extension):
+    scores_df, comments_df = sample_frames()
+    ids = {'Ayesha': 101, 'Ali': 102, 'Badreyah': 103}
+    scores_df['name'] = scores_df['name'].map(ids)
+    comments_df['name'] = comments_df['name'].map(ids)
+    scores_path, comments_path, output_path = tmp_path / f'scores{extension}', tmp_path / f'comments{extension}', tmp_path / 'out.csv'
+    for df, path in ((scores_df, scores_path), (comments_df, comments_path)):
+        df.to_excel(path, index=False) if extension == '.xlsx' else df.to_parquet(path)
+
+    run(parse_args(['--scores', str(scores_path), '--comments', str(comments_path), '--output', str(output_path), '--draft-only']))
+
+    # The sample comments have no rows for Badreyah (103)
+    assert pd.read_csv(output_path)['name'].astype(str).tolist() == ['101', '102']
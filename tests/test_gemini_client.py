@@ -0,0 +1,109 @@
+import json
+
+import pytest
+import requests
+
+from gemini_client import GeminiClient, GeminiDispatcher, retry_after_seconds
+
+
+def make_response(status, body=None, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(body or {}).encode('utf-8')
+    response.headers.update(headers or {})
+    return response
+
+
+OK = {'candidates': [{'content': {'parts': [{'text': "A report."}]}}], 'usageMetadata': {}}
+
+
+class ScriptedSession:
+    """Stands in for requests.Session, answering each post with the next scripted response (or exception)."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def post(self, url, **kwargs):
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def open_breaker_client(*trial_responses):
+    """Returns a client whose breaker has been opened by two 503s, with trial_responses queued after them."""
+    session = ScriptedSession(make_response(503), make_response(503), *trial_responses)
+    client = GeminiClient(max_retries=1, failure_threshold=2, reset_timeout=0.0, session=session)
+    for _ in range(2):
+        client.generate("prompt", "key", "model")
+    assert client.breaker.is_open
+    return client
+
+
+@pytest.mark.parametrize('trial_response', [
+    make_response(429, headers={'Retry-After': '0'}),
+    make_response(400),
+    make_response(403),
+    requests.exceptions.InvalidURL("bad url"),
+])
+def test_half_open_trial_without_verdict_does_not_wedge_breaker(trial_response):
+    client = open_breaker_client(trial_response, make_response(200, OK))
+    client.generate("prompt", "key", "model")
+    assert client.generate("prompt", "key", "model") == "A report."
+    assert not client.breaker.is_open
+
+
+def test_malformed_retry_after_header_is_ignored():
+    assert retry_after_seconds(make_response(429, headers={'Retry-After': 'soon'})) is None
+    assert retry_after_seconds(make_response(429, headers={'Retry-After': '3'})) == 3.0
+
+
+def test_dispatcher_recovers_after_breaker_trial_gets_429():
+    session = ScriptedSession(
+        make_response(503), make_response(503), make_response(429, headers={'Retry-After': '0'}), make_response(200, OK)
+    )
+    dispatcher = GeminiDispatcher(['key'], ['model'], max_retries=1, session=session, failure_threshold=2, reset_timeout=0.0)
+    for _ in range(3):
+        dispatcher.generate("prompt")
+    assert dispatcher.generate("prompt") == "A report."
+
+
+def stuck_dispatcher(api_keys):
+    """Returns a dispatcher whose first key's breaker has been open for longer than the drop cutoff."""
+    dispatcher = GeminiDispatcher(api_keys, ['model'], session=ScriptedSession(), reset_timeout=3600.0)
+    breaker = dispatcher.clients[(api_keys[0], 'model')].breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    breaker.open_since -= dispatcher.max_breaker_open_seconds + 1
+    return dispatcher
+
+
+def test_dispatcher_drops_pair_whose_breaker_stays_open():
+    dispatcher = stuck_dispatcher(['key1', 'key2'])
+    assert dispatcher._choose(set()) == ('key2', 'model')
+    assert ('key1', 'model') in dispatcher.dropped
+
+
+def test_dispatcher_keeps_last_pair_even_if_its_breaker_stays_open():
+    dispatcher = stuck_dispatcher(['key1'])
+    assert dispatcher._choose(set()) == ('key1', 'model')
+    assert not dispatcher.dropped
+
+
+def test_dispatcher_reports_no_negative_retries_when_breaker_fails_fast():
+    dispatcher = stuck_dispatcher(['key1'])
+    dispatcher.max_retries = 1
+    metrics = {}
+    assert dispatcher.generate("prompt", metrics=metrics).startswith("Error:")
+    assert metrics['attempts'] == 0 and metrics['retries'] == 0
+
+
+def test_invalid_stream_response_is_closed():
+    response = make_response(200)
+    response._content = b'data: {"candidates": [\n\n'
+    response._content_consumed = True
+    closed = []
+    response.close = lambda: closed.append(True)
+    client = GeminiClient(max_retries=1, session=ScriptedSession(response))
+    assert client.generate("prompt", "key", "model", on_text=lambda text: None).startswith("Error:")
+    assert closed
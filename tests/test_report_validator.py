@@ -0,0 +1,30 @@
+import re
+
+import pytest
+
+from prompt_builder import PROMPT_INTRO_AND_EXAMPLES
+from report_validator import validate_report
+
+
+def golden_examples():
+    """Yields (name, gender, comments, correct output) for each golden example in the prompt."""
+    for block in re.split(r'^EXAMPLE \d+$', PROMPT_INTRO_AND_EXAMPLES, flags=re.MULTILINE)[1:]:
+        input_data, output = block.split('CORRECT OUTPUT:\n')
+        name, gender = re.search(r'First Name: (\w+), Gender: (\w+)', input_data).groups()
+        comments = re.findall(r'^(?:Strength|Development) Comment \(\w+\): (.+)$', input_data, flags=re.MULTILINE)
+        yield name, gender, comments, output.strip()
+
+
+@pytest.mark.parametrize('name, gender, comments, output', list(golden_examples()))
+def test_golden_examples_pass_validation(name, gender, comments, output):
+    assert validate_report(output, gender, comments, name) == []
+
+
+@pytest.mark.parametrize('text, flagged', [
+    ("She drives results and leads people with energy.", False),
+    ("Her Drives Results score stands out.", True),
+    ("Drives_Results is her top area.", True),
+])
+def test_competency_names_only_match_title_case_or_underscore_forms(text, flagged):
+    violations = validate_report(text)
+    assert any(violation.startswith('competency_name') for violation in violations) == flagged
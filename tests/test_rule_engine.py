@@ -0,0 +1,15 @@
+import pandas as pd
+
+from rule_engine import COMPETENCIES, compute_report_facts, format_facts_for_prompt
+
+
+def test_low_band_and_development_threshold_agree():
+    scores = dict(zip(COMPETENCIES, [3.6, 3.0, 2.495, 2.5, 2.49, 3.2]))
+    facts = compute_report_facts(pd.DataFrame([{
+        'name': 'Ayesha', 'gender': 'Female', 'level': 'Guide', 'Overall Leadership': 3.0, **scores,
+    }])).loc['Ayesha']
+
+    low = [competency for competency, band in facts['bands'].items() if band == 'Low']
+    assert facts['threshold_development_areas'] == low == ['Manages Stakeholders', 'Solves Challenges']
+    assert facts['threshold_strengths'] == ['Drives Results']
+    assert "Always development areas (scores below 2.5): Manages Stakeholders, Solves Challenges" in format_facts_for_prompt(facts)
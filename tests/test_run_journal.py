@@ -0,0 +1,11 @@
+import pytest
+
+from run_journal import RunJournal
+
+
+@pytest.mark.parametrize('resume, bypass_cache, kept', [(True, False, True), (False, False, False), (True, True, False)])
+def test_reset_unless_resuming(tmp_path, resume, bypass_cache, kept):
+    journal = RunJournal('run', directory=str(tmp_path))
+    journal.append('Ayesha', "A report.")
+    assert journal.reset_unless_resuming(resume, bypass_cache) == (not kept)
+    assert bool(journal.completed()) == kept